@@ -0,0 +1,130 @@
+# Grading for open answers. Every accepted answer (the answer plus any
+# "aliases" on the question) is normalized once when its key is built:
+# NFKC, casefold, punctuation and articles removed. A submission
+# that normalizes to one of them is a set lookup. Otherwise a bigram index
+# over the accepted forms narrows them down to the few that could be within
+# a small edit-distance budget, and only those get a bounded Levenshtein
+# check. "Oxigen" still counts as "Oxygen", and thousands of aliases cost a
+# handful of distance computations rather than one per alias.
+#
+# Answers with digits in them are only accepted exactly: "1999" is not a
+# typo of "1998".
+import re
+import unicodedata
+from collections import Counter, OrderedDict
+from itertools import chain
+
+difficulty_points = {"easy": 10, "medium": 20, "hard": 30}
+ARTICLES = frozenset({"a", "an", "the"})
+# (shortest length, allowed typos): 1 typo from 6 characters, 2 from 9.
+# Shorter answers are too often one letter away from another real word
+# ("Iron" and "Icon", "Mars" and "Bars", "Merge" and "verge").
+TYPO_BUDGET = ((9, 2), (6, 1))
+KEY_CACHE_SIZE = 1024
+
+
+def normalize_answer(text):
+    text = unicodedata.normalize("NFKC", text).casefold()
+    words = re.sub(r"[^\w\s]", " ", text).split()
+    # An answer that is nothing but an article ("A") keeps it
+    return " ".join([word for word in words if word not in ARTICLES] or words)
+
+
+def max_typos(text):
+    if any(ch.isdigit() for ch in text):
+        return 0
+    for length, typos in TYPO_BUDGET:
+        if len(text) >= length:
+            return typos
+    return 0
+
+
+# Edit distance, or limit + 1 as soon as it is known to exceed limit
+def bounded_levenshtein(a, b, limit):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+    previous = list(range(len(a) + 1))
+    for j, cb in enumerate(b, 1):
+        current = [j]
+        for i, ca in enumerate(a, 1):
+            current.append(min(previous[i] + 1, current[i - 1] + 1, previous[i - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+# Bigrams of text, numbered by occurrence so repeated ones count separately
+def bigrams(text):
+    seen = {}
+    grams = []
+    for i in range(len(text) - 1):
+        gram = text[i:i + 2]
+        seen[gram] = seen.get(gram, 0) + 1
+        grams.append((gram, seen[gram]))
+    return grams
+
+
+class AnswerKey:
+    def __init__(self, answers):
+        self.exact = {normalize_answer(answer) for answer in answers if isinstance(answer, str)}
+        self.exact.discard("")
+        # Only forms that allow typos are indexed for fuzzy lookup
+        self.forms = [form for form in self.exact if max_typos(form)]
+        self.postings = {}
+        for form_id, form in enumerate(self.forms):
+            for gram in bigrams(form):
+                self.postings.setdefault(gram, []).append(form_id)
+
+    def matches(self, response):
+        response = normalize_answer(response)
+        if response in self.exact:
+            return True
+        limit = max_typos(response)
+        if not limit or not self.forms:
+            return False
+
+        # Each edit changes at most two of the response's bigrams, so a form
+        # within limit edits shares at least this many of them
+        grams = bigrams(response)
+        needed = len(grams) - 2 * limit
+        if needed > 0:
+            shared = Counter(chain.from_iterable(self.postings.get(gram, ()) for gram in grams))
+            candidates = [self.forms[form_id] for form_id, count in shared.items() if count >= needed]
+        else:
+            candidates = self.forms
+        for form in candidates:
+            # Both sides must be long enough for the typos, so "cat" never passes for "hat"
+            form_limit = min(limit, max_typos(form))
+            if bounded_levenshtein(response, form, form_limit) <= form_limit:
+                return True
+        return False
+
+
+# Keys are built once per question and reused while it is in the recent
+# window, e.g. when the same bank question comes up in another round.
+class AnswerGrader:
+    def __init__(self, cache_size=KEY_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.keys = OrderedDict()
+
+    def key_for(self, question):
+        cache_key = (question["answer"], tuple(question.get("aliases", ())))
+        key = self.keys.get(cache_key)
+        if key is None:
+            key = AnswerKey((question["answer"], *question.get("aliases", ())))
+            self.keys[cache_key] = key
+            if len(self.keys) > self.cache_size:
+                self.keys.popitem(last=False)
+        else:
+            self.keys.move_to_end(cache_key)
+        return key
+
+    # Multiple-choice and true/false answers come from fixed options, so
+    # only open answers get fuzzy matching
+    def grade(self, question, response):
+        if question.get("type") != "open":
+            return response.strip().casefold() == question["answer"].strip().casefold()
+        return self.key_for(question).matches(response)
@@ -0,0 +1,111 @@
+# Headless re-grading of recorded submissions, e.g. after answer keys have
+# changed. Input is columnar: parallel sequences of question ids, submitted
+# answers and difficulties. Output is columnar too: a bytearray of 0/1
+# correctness and an array of points per submission, plus the ids that are
+# not in the bank, whose submissions are reported rather than graded.
+#
+# A question's id is its "id" field, or its question_hash when it has none,
+# so ids do not shift when other records in the bank are added or removed.
+#
+# Submissions repeat a lot (the same right answer, the same common wrong
+# one), so only the distinct (question, answer) pairs are graded, by the
+# same rules as the game. The results are spread back over the rows with
+# C-level map/array operations instead of a Python call per submission.
+#
+# Usage: python batch_grader.py submissions.csv --bank questions.qbank -o graded.csv
+#        (CSV columns: question_id, answer, difficulty)
+import argparse
+import csv
+import operator
+from array import array
+from itertools import repeat
+
+from answer_grader import AnswerGrader, difficulty_points
+from live_bank import open_questions
+from question_bank import QuestionBank
+from question_cache import question_hash
+
+
+def question_id(question):
+    if "id" in question:
+        return str(question["id"])
+    return question_hash(question)
+
+
+class BatchGrader:
+    def __init__(self, questions, points=difficulty_points):
+        self.questions = questions
+        self.points = points
+        self.grader = AnswerGrader()
+
+    # questions is anything with get(question_id), e.g. the dict from
+    # load_questions; rows with unknown ids get 0 in correct and scores
+    def grade(self, question_ids, answers, difficulties):
+        results = dict.fromkeys(zip(question_ids, answers))
+        unknown = set()
+        for question_id, answer in results:
+            outcome = self.grade_one(question_id, answer)
+            if outcome is None:
+                unknown.add(question_id)
+                outcome = 0
+            results[question_id, answer] = outcome
+        correct = bytearray(map(results.__getitem__, zip(question_ids, answers)))
+        row_points = map(self.points.get, difficulties, repeat(0))
+        scores = array("I", map(operator.mul, correct, row_points))
+        return correct, scores, unknown
+
+    # 1 or 0, or None if there is no such question
+    def grade_one(self, question_id, answer):
+        question = self.questions.get(question_id)
+        if question is None:
+            return None
+        return 1 if self.grader.grade(question, answer) else 0
+
+
+def read_submissions(path):
+    question_ids = []
+    answers = []
+    difficulties = []
+    with open(path, newline="") as file:
+        for row in csv.DictReader(file):
+            question_ids.append(row["question_id"])
+            answers.append(row["answer"])
+            difficulties.append(row["difficulty"])
+    return question_ids, answers, difficulties
+
+
+# {question id: question} for every question in the bank files
+def load_questions(paths):
+    bank = open_questions(paths)
+    if isinstance(bank, QuestionBank):
+        questions = (bank.get(record_id) for record_id in range(len(bank)))
+    else:
+        questions = bank.current().records.values()
+    return {question_id(question): question for question in questions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-grade recorded submissions against the current answer keys.")
+    parser.add_argument("submissions", help="CSV with question_id, answer, difficulty columns")
+    parser.add_argument("--bank", nargs="+", required=True, help="a .qbank file or the JSON/CSV question files")
+    parser.add_argument("-o", "--output", help="write question_id, answer, difficulty, correct, score rows here")
+    args = parser.parse_args()
+
+    question_ids, answers, difficulties = read_submissions(args.submissions)
+    correct, scores, unknown = BatchGrader(load_questions(args.bank)).grade(question_ids, answers, difficulties)
+    if args.output:
+        with open(args.output, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["question_id", "answer", "difficulty", "correct", "score"])
+            for row in zip(question_ids, answers, difficulties, correct, scores):
+                # Ungraded rows are left blank rather than scored as wrong
+                writer.writerow(row[:3] + ("", "") if row[0] in unknown else row)
+    skipped = sum(question_id in unknown for question_id in question_ids) if unknown else 0
+    print(f"{sum(correct)} of {len(correct) - skipped} correct, {sum(scores)} points")
+    if unknown:
+        listed = ", ".join(sorted(unknown)[:10]) + (", ..." if len(unknown) > 10 else "")
+        print(f"Error grading {skipped} submissions: {len(unknown)} question ids are not in the bank ({listed})")
+
+
+if __name__ == "__main__":
+    main()
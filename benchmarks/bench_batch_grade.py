@@ -0,0 +1,58 @@
+# Measures re-grading throughput: the batch grader on columnar submissions
+# against grading them one at a time the way submit_answer does.
+#
+# Usage: python -m benchmarks.bench_batch_grade --submissions 1000000
+import argparse
+import random
+import time
+from array import array
+
+from answer_grader import AnswerGrader
+from batch_grader import BatchGrader
+from mock_server import make_question
+
+LEVELS = ["easy", "medium", "hard"]
+
+
+def make_submission(question, rng):
+    roll = rng.random()
+    if roll < 0.5:
+        return question["answer"]
+    if roll < 0.6:
+        return question["answer"].lower() + "."
+    if roll < 0.7 and question["type"] == "open":
+        return question["answer"] + "1"
+    return rng.choice(question.get("options") or ["True", "False", "no idea"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch re-grading of submissions.")
+    parser.add_argument("--submissions", type=int, default=1000000)
+    parser.add_argument("--questions", type=int, default=10000)
+    parser.add_argument("--single", type=int, default=100000, help="submissions to grade one at a time")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    levels = [rng.choice(LEVELS) for _ in range(args.questions)]
+    questions = {i: dict(make_question(level, rng), difficulty=level) for i, level in enumerate(levels)}
+    question_ids = array("I", (rng.randrange(args.questions) for _ in range(args.submissions)))
+    answers = [make_submission(questions[i], rng) for i in question_ids]
+    difficulties = [levels[i] for i in question_ids]
+
+    start = time.perf_counter()
+    correct, scores, _ = BatchGrader(questions).grade(question_ids, answers, difficulties)
+    elapsed = time.perf_counter() - start
+    print(f"batch grader   {elapsed:7.2f} s  {args.submissions / elapsed:12,.0f} submissions/s  "
+          f"({sum(correct)} correct, {sum(scores)} points)")
+
+    grader = AnswerGrader()
+    count = min(args.single, args.submissions)
+    start = time.perf_counter()
+    for i in range(count):
+        grader.grade(questions[question_ids[i]], answers[i])
+    elapsed = time.perf_counter() - start
+    print(f"one at a time  {elapsed:7.2f} s  {count / elapsed:12,.0f} submissions/s  (first {count})")
+
+
+if __name__ == "__main__":
+    main()
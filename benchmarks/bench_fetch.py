@@ -0,0 +1,102 @@
+# Measures per-round fetch latency against the question API.
+# Compares one-off requests.get calls (the old behaviour) with the
+# pooled keep-alive session, per question, as a single batch and as an
+# NDJSON stream. For each mode it reports time to first question, round
+# latency percentiles and how often a round came back short (the game tops
+# it up from the cache) or empty (the game falls back to local questions).
+#
+# Usage: python -m benchmarks.bench_fetch --url http://127.0.0.1:8000/generate_question
+#        python -m benchmarks.bench_fetch --mock --latency-ms 20 --jitter-ms 30 --latency-dist exponential \
+#               --error-rate 0.05 --malformed-rate 0.05 --seed 1
+import argparse
+import statistics
+import time
+
+import requests
+
+import mock_server
+import question_api
+from question_api import CircuitBreaker, create_session, fetch_questions, probe_api
+
+
+def fetch_round_without_session(difficulty, num):
+    for _ in range(num):
+        try:
+            response = requests.get(question_api.API_URL, params={"difficulty": difficulty}, timeout=question_api.REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                yield response.json()
+        except Exception as e:
+            print(f"Exception while calling API: {e}")
+
+
+def fetch_round_with_session(session, difficulty, num, batch, stream=False):
+    question_api.batch_supported = None if batch else False
+    question_api.STREAM_QUESTIONS = stream
+    return fetch_questions(difficulty, num, session)
+
+
+def time_rounds(fetch_round, rounds, num):
+    # Each mode starts with a closed breaker so one mode's failures don't leak into the next
+    question_api.breaker = CircuitBreaker(probe=probe_api)
+    first_samples = []
+    round_samples = []
+    short = empty = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        first = None
+        count = 0
+        for _ in fetch_round():
+            count += 1
+            if first is None:
+                first = time.perf_counter()
+        end = time.perf_counter()
+        first_samples.append(((first or end) - start) * 1000)
+        round_samples.append((end - start) * 1000)
+        if count == 0:
+            empty += 1
+        elif count < num:
+            short += 1
+    return first_samples, round_samples, short, empty
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, results):
+    first_samples, round_samples, short, empty = results
+    rounds = len(round_samples)
+    print(f"{label:<16} first p50 {percentile(first_samples, 50):7.1f} ms | "
+          f"round mean {statistics.mean(round_samples):7.1f}  p50 {percentile(round_samples, 50):7.1f}  "
+          f"p95 {percentile(round_samples, 95):7.1f}  p99 {percentile(round_samples, 99):7.1f} ms | "
+          f"short {short / rounds:6.1%}  fallback {empty / rounds:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-round question fetch latency.")
+    parser.add_argument("--url", default=question_api.API_URL)
+    parser.add_argument("--difficulty", default="easy")
+    parser.add_argument("--num", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--mock", action="store_true", help="run against a local mock_server instead of --url")
+    mock_server.add_server_arguments(parser)
+    parser.set_defaults(latency_ms=10.0)
+    args = parser.parse_args()
+
+    question_api.API_URL = args.url
+    if args.mock:
+        server = mock_server.start_server(**mock_server.server_options(args))
+        question_api.API_URL = mock_server.server_url(server)
+    session = create_session()
+    num = args.num
+
+    report("requests.get", time_rounds(lambda: fetch_round_without_session(args.difficulty, num), args.rounds, num))
+    report("pooled session", time_rounds(lambda: fetch_round_with_session(session, args.difficulty, num, False), args.rounds, num))
+    report("batch request", time_rounds(lambda: fetch_round_with_session(session, args.difficulty, num, True), args.rounds, num))
+    report("ndjson stream", time_rounds(lambda: fetch_round_with_session(session, args.difficulty, num, True, True), args.rounds, num))
+
+
+if __name__ == "__main__":
+    main()
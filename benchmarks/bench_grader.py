@@ -0,0 +1,62 @@
+# Measures open-answer grading for a question with many accepted aliases:
+# building the answer key, then grading exact hits, one-typo answers and
+# misses, against comparing the response with every alias in turn.
+#
+# Usage: python -m benchmarks.bench_grader --aliases 5000
+import argparse
+import random
+import string
+import time
+
+from answer_grader import AnswerKey, bounded_levenshtein, max_typos, normalize_answer
+
+
+def make_alias(rng):
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(rng.randint(1, 3))]
+    return " ".join(words).title()
+
+
+def add_typo(text, rng):
+    i = rng.randrange(len(text))
+    return text[:i] + rng.choice(string.ascii_lowercase) + text[i + 1:]
+
+
+def naive_matches(aliases, response):
+    response = normalize_answer(response)
+    for alias in aliases:
+        alias = normalize_answer(alias)
+        limit = min(max_typos(alias), max_typos(response))
+        if bounded_levenshtein(response, alias, limit) <= limit:
+            return True
+    return False
+
+
+def timed(label, fn, responses):
+    start = time.perf_counter()
+    hits = sum(fn(response) for response in responses)
+    per_call = (time.perf_counter() - start) / len(responses)
+    print(f"{label:<28} {per_call * 1e6:10.1f} us  ({hits}/{len(responses)} accepted)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy open-answer grading.")
+    parser.add_argument("--aliases", type=int, default=5000)
+    parser.add_argument("--responses", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    aliases = [make_alias(rng) for _ in range(args.aliases)]
+    start = time.perf_counter()
+    key = AnswerKey(aliases)
+    print(f"build key ({args.aliases} aliases) {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+    exact = [rng.choice(aliases) + "." for _ in range(args.responses)]
+    typos = [add_typo(rng.choice([a for a in aliases if len(a) >= 6]), rng) for _ in range(args.responses)]
+    misses = [make_alias(rng) for _ in range(args.responses)]
+    for label, responses in (("exact", exact), ("one typo", typos), ("miss", misses)):
+        timed(f"AnswerKey {label}", key.matches, responses)
+        timed(f"linear scan {label}", lambda response: naive_matches(aliases, response), responses[:50])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Compares ways of answering the leaderboard questions the game asks on
+# every round, "is this name taken?", "who is in the top 5?" and "where
+# did this score place?", on a large leaderboard file: scanning and
+# sorting the file each time (the old way), the in-memory LeaderboardIndex
+# and the SQLite LeaderboardStore.
+#
+# Usage: python -m benchmarks.bench_leaderboard --rows 1000000
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from leaderboard import LeaderboardIndex, append_results
+from leaderboard_store import LeaderboardStore
+
+
+def scan_name_exists(path, name):
+    with open(path, "r") as file:
+        for line in file:
+            if line.split(",")[0].strip().lower() == name.lower():
+                return True
+    return False
+
+
+def scan_top(path, k=5):
+    with open(path, "r") as file:
+        entries = [line.strip().split(",") for line in file.readlines()]
+    entries.sort(key=lambda x: int(x[1]), reverse=True)
+    return entries[:k]
+
+
+def scan_placement(path, score, difficulty):
+    with open(path, "r") as file:
+        scores = sorted((int(x[1]) for x in (line.strip().split(",") for line in file) if x[2] == difficulty), reverse=True)
+    return sum(1 for s in scores if s > score) + 1, len(scores)
+
+
+def timed(label, fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    per_call = (time.perf_counter() - start) / repeat
+    print(f"{label:<34} {per_call * 1e6:12.1f} us")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark leaderboard lookups.")
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    rows = [(f"player{i}", rng.randrange(0, 151, 10), rng.choice(["easy", "medium", "hard"])) for i in range(args.rows)]
+    names = [f"Player{rng.randrange(args.rows * 2)}" for _ in range(1000)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "leaderboard.txt")
+        append_results(rows, path)
+        print(f"{args.rows:,} results, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        timed("scan: name check", lambda i: scan_name_exists(path, names[i]), 3)
+        timed("scan: top 5", lambda i: scan_top(path), 3)
+        timed("scan: placement", lambda i: scan_placement(path, 70, "easy"), 3)
+
+        start = time.perf_counter()
+        index = LeaderboardIndex(path).load()
+        print(f"{'index: load':<34} {(time.perf_counter() - start) * 1e3:12.1f} ms")
+        timed("index: name check", lambda i: index.name_exists(names[i]), 1000)
+        timed("index: top 5", lambda i: index.top(5), 1000)
+        timed("index: top 5 for one difficulty", lambda i: index.top(5, "hard"), 1000)
+        timed("index: placement", lambda i: index.placement(i % 160, "easy"), 1000)
+        timed("index: save a result", lambda i: index.add(f"new{i}", rng.randrange(0, 151, 10), "easy"), 1000)
+
+        store = LeaderboardStore(os.path.join(tmp, "leaderboard.db"))
+        start = time.perf_counter()
+        store.import_file(path)
+        print(f"{'sqlite: import':<34} {(time.perf_counter() - start) * 1e3:12.1f} ms")
+        timed("sqlite: name check", lambda i: store.name_exists(names[i]), 1000)
+        timed("sqlite: top 5", lambda i: store.top(5), 1000)
+        timed("sqlite: top 5 for one difficulty", lambda i: store.top(5, "hard"), 1000)
+        timed("sqlite: placement", lambda i: store.placement(i % 160, "easy"), 1000)
+        timed("sqlite: save a result", lambda i: store.add(f"new{i}", rng.randrange(0, 151, 10), "easy"), 1000)
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Measures the near-duplicate index: build time, check latency per question
+# against a pairwise trigram Jaccard scan over the whole bank, and how many
+# reworded questions it catches (and wrongly flags) at the threshold.
+#
+# Usage: python -m benchmarks.bench_near_dup --items 100000 --threshold 0.8
+import argparse
+import random
+import time
+
+from near_dup import NearDuplicateIndex, trigrams
+from seen_filter import normalize_text
+
+SYLLABLES = "ka lo mi ne ra so tu ve wi za bi cho de fu ga hi jo ku li mo".split()
+QUESTION_WORDS = ["which", "what", "where", "who", "when", "how"]
+FILLERS = ["the", "a", "of", "in", "is", "does", "for"]
+
+
+def make_vocabulary(rng, size):
+    return ["".join(rng.choices(SYLLABLES, k=rng.randint(1, 4))) for _ in range(size)]
+
+
+def make_text(rng, vocabulary):
+    words = [rng.choice(QUESTION_WORDS)] + rng.sample(vocabulary, rng.randint(4, 8))
+    return " ".join(words).capitalize() + "?"
+
+
+# Small rewording: one filler word inserted or one word dropped
+def reword(text, rng):
+    words = text.rstrip("?").split()
+    if rng.random() < 0.5:
+        words.insert(rng.randrange(1, len(words)), rng.choice(FILLERS))
+    else:
+        del words[rng.randrange(1, len(words))]
+    return " ".join(words) + "?"
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate question detection.")
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--checks", type=int, default=1000)
+    parser.add_argument("--scan-checks", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--vocabulary", type=int, default=5000, help="distinct words questions are made of")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    vocabulary = make_vocabulary(rng, args.vocabulary)
+    texts = [make_text(rng, vocabulary) for _ in range(args.items)]
+
+    index = NearDuplicateIndex(args.threshold)
+    start = time.perf_counter()
+    index.add_many(enumerate(texts))
+    build = time.perf_counter() - start
+    print(f"build {args.items} questions      {build:8.2f} s  ({build / args.items * 1e6:.0f} us each, "
+          f"{index.bands} bands x {index.rows} rows)")
+
+    originals = [rng.randrange(args.items) for _ in range(args.checks)]
+    reworded = [reword(texts[i], rng) for i in originals]
+    fresh = [make_text(rng, vocabulary) for _ in range(args.checks)]
+    bank_trigrams = [trigrams(normalize_text(text)) for text in texts]
+
+    samples = []
+    caught = expected = flagged = 0
+    for i, text in zip(originals, reworded):
+        start = time.perf_counter()
+        matches = index.find(text)
+        samples.append((time.perf_counter() - start) * 1e6)
+        if jaccard(trigrams(normalize_text(text)), bank_trigrams[i]) >= args.threshold:
+            expected += 1
+            caught += any(key == i for key, _ in matches)
+    for text in fresh:
+        start = time.perf_counter()
+        flagged += bool(index.find(text))
+        samples.append((time.perf_counter() - start) * 1e6)
+    print(f"index check                  p50 {percentile(samples, 50):8.0f} us  p99 {percentile(samples, 99):8.0f} us")
+
+    start = time.perf_counter()
+    for text in reworded[:args.scan_checks]:
+        query = trigrams(normalize_text(text))
+        [i for i, other in enumerate(bank_trigrams) if jaccard(query, other) >= args.threshold]
+    scan = (time.perf_counter() - start) / args.scan_checks
+    print(f"pairwise scan                mean {scan * 1e6:8.0f} us")
+
+    print(f"rewordings at or above threshold caught: {caught}/{expected}")
+    print(f"unrelated questions flagged: {flagged}/{len(fresh)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Measures how long the live question bank takes to load and to pick up
+# edits to a large JSON Lines bank file.
+#
+# Usage: python -m benchmarks.bench_reload --items 100000
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from live_bank import LiveQuestionBank
+from mock_server import make_question
+
+
+def write_bank(path, questions):
+    with open(path, "w") as file:
+        for question in questions:
+            file.write(json.dumps(question) + "\n")
+    # Make sure the poller sees a new mtime even on coarse clocks
+    os.utime(path, ns=(time.time_ns(), time.time_ns()))
+
+
+def timed_reload(label, bank):
+    start = time.perf_counter()
+    added, removed = bank.reload()
+    print(f"{label:<28} {(time.perf_counter() - start) * 1000:8.1f} ms  (+{added} -{removed}, {len(bank)} questions)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark live question bank reloads.")
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--edits", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    questions = []
+    for i in range(args.items):
+        difficulty = rng.choice(["easy", "medium", "hard"])
+        questions.append(dict(make_question(difficulty, rng), difficulty=difficulty, category=f"c{i % 20}"))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "questions.jsonl")
+        write_bank(path, questions)
+        bank = LiveQuestionBank([path])
+        timed_reload("initial load", bank)
+
+        write_bank(path, questions + [dict(make_question("easy", rng), difficulty="easy") for _ in range(args.edits)])
+        timed_reload(f"append {args.edits}", bank)
+
+        for i in rng.sample(range(args.items), args.edits):
+            questions[i] = dict(questions[i], question=questions[i]["question"] + " (edited)")
+        write_bank(path, questions)
+        timed_reload(f"edit {args.edits} + drop appended", bank)
+
+        timed_reload("unchanged", bank)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# Compares the alias-table sampler with naive weighted random.choices on a
+# large bank: building, drawing rounds of k questions and updating a weight.
+#
+# Usage: python -m benchmarks.bench_sampler --items 1000000
+import argparse
+import random
+import time
+
+from question_sampler import QuestionSampler, WeightedSampler
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    per_call = (time.perf_counter() - start) / repeat
+    print(f"{label:<36} {per_call * 1e6:12.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark weighted question sampling.")
+    parser.add_argument("--items", type=int, default=1000000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--naive-rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    weights = [rng.random() for _ in range(args.items)]
+    population = range(args.items)
+
+    timed("build WeightedSampler", lambda: WeightedSampler(weights))
+    sampler = WeightedSampler(weights)
+    timed(f"alias draw x{args.k}", lambda: [sampler.draw(rng) for _ in range(args.k)], args.rounds)
+    timed(f"random.choices x{args.k} (weights)", lambda: rng.choices(population, weights, k=args.k), args.naive_rounds)
+    timed("alias update one weight", lambda: sampler.update(rng.randrange(args.items), rng.random()), args.rounds)
+
+    categories = [rng.randrange(20) for _ in range(args.items)]
+    timed("build QuestionSampler", lambda: QuestionSampler(categories))
+    questions = QuestionSampler(categories)
+    timed(f"QuestionSampler.sample({args.k})", lambda: questions.sample(args.k, "player", rng), args.rounds)
+    timed("QuestionSampler.record_result", lambda: questions.record_result(rng.randrange(args.items), False), args.rounds)
+
+
+if __name__ == "__main__":
+    main()
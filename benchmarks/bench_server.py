@@ -0,0 +1,153 @@
+# Load test for the multiplayer quiz server: starts quiz_server.py on a
+# generated question bank, connects many players at once, plays whole
+# rounds and reports how late the server's timer ticks ran (the time every
+# player waits on top of the network) along with round throughput.
+#
+# Usage: python -m benchmarks.bench_server --players 10000 --lobby-size 500
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_server import make_question
+
+CONNECT_CONCURRENCY = 500
+
+
+def write_bank(path, per_difficulty, rng):
+    with open(path, "w") as file:
+        for difficulty in ("easy", "medium", "hard"):
+            for _ in range(per_difficulty):
+                file.write(json.dumps(dict(make_question(difficulty, rng), difficulty=difficulty)) + "\n")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def raise_file_limit(wanted):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = min(hard, max(soft, wanted))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    return target
+
+
+async def wait_for_server(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+# One simulated player: joins, answers each question after a random think
+# time (sometimes not at all) and reads until the round is finished
+async def play(port, index, difficulty, time_limit, connect_gate, results, rng):
+    async with connect_gate:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write((json.dumps({"type": "join", "name": f"player{index}", "difficulty": difficulty}) + "\n").encode())
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                results["dropped"] += 1
+                return
+            message = json.loads(line)
+            kind = message["type"]
+            if kind == "question":
+                results["questions"] += 1
+                if rng.random() < 0.9:
+                    question = message["question"]
+                    answer = rng.choice(question.get("options") or ["True", "False", "42"])
+                    await asyncio.sleep(rng.uniform(0, time_limit * 0.8))
+                    writer.write((json.dumps({"type": "answer", "answer": answer}) + "\n").encode())
+            elif kind == "finished":
+                results["finished"] += 1
+                return
+            elif kind == "error":
+                results["errors"] += 1
+                return
+    finally:
+        writer.close()
+
+
+async def server_stats(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b'{"type": "stats"}\n')
+    stats = json.loads(await reader.readline())
+    writer.close()
+    return stats
+
+
+async def run_players(args, port):
+    await wait_for_server(port)
+    rng = random.Random(1)
+    gate = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    results = {"questions": 0, "finished": 0, "dropped": 0, "errors": 0}
+    start = time.perf_counter()
+    players = [play(port, i, ("easy", "medium", "hard")[i % 3], args.time_limit, gate, results, rng)
+               for i in range(args.players)]
+    outcomes = await asyncio.gather(*players, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    failures = sum(isinstance(outcome, Exception) for outcome in outcomes)
+    return results, failures, elapsed, await server_stats(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the multiplayer quiz server.")
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--lobby-size", type=int, default=500)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--time-limit", type=float, default=2.0)
+    args = parser.parse_args()
+
+    # The server and this client each hold one socket per player
+    limit = raise_file_limit(args.players + 1000)
+    if limit < args.players + 100:
+        print(f"Open file limit is {limit}; lowering --players to fit")
+        args.players = limit - 100
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bank_path = os.path.join(tmp, "bank.jsonl")
+        leaderboard_path = os.path.join(tmp, "leaderboard.txt")
+        write_bank(bank_path, 1000, random.Random(1))
+        port = free_port()
+        server = subprocess.Popen([
+            sys.executable, "quiz_server.py", "--port", str(port), "--bank", bank_path,
+            "--lobby-size", str(args.lobby_size), "--lobby-wait", "2", "--questions", str(args.questions),
+            "--time-limit", str(args.time_limit), "--reveal-pause", "0.5", "--leaderboard", leaderboard_path,
+            "--leaderboard-db", os.path.join(tmp, "leaderboard.db"),
+        ])
+        try:
+            results, failures, elapsed, stats = asyncio.run(run_players(args, port))
+        finally:
+            server.terminate()
+            server.wait()
+        with open(leaderboard_path) as file:
+            saved = sum(1 for _ in file)
+
+    print(f"players {args.players}  lobbies of {args.lobby_size}  {args.questions} questions x {args.time_limit:g} s")
+    print(f"finished {results['finished']}  dropped {results['dropped']}  errors {results['errors']}  "
+          f"failed {failures}  leaderboard rows {saved}")
+    print(f"wall time {elapsed:6.1f} s  {results['questions'] / elapsed:10,.0f} questions delivered/s")
+    print(f"timer tick lag  p50 {stats['lag_p50_ms']:.1f} ms  p99 {stats['lag_p99_ms']:.1f} ms  "
+          f"max {stats['lag_max_ms']:.1f} ms  (tick {stats['tick_ms']:.0f} ms)")
+    print(f"tick work       mean {stats['busy_mean_ms']:.2f} ms  max {stats['busy_max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Measures how many QuizSession objects one process can hold and drive:
+# memory per session and events per second for whole rounds of start,
+# ask, answer and timeout.
+#
+# Usage: python -m benchmarks.bench_sessions --sessions 100000
+import argparse
+import random
+import time
+import tracemalloc
+
+from mock_server import make_question
+from quiz_session import FINISHED, QuizSession
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark many concurrent quiz sessions.")
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--questions", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    # Players in one event share the same round of questions
+    questions = [make_question("medium", rng) for _ in range(args.questions)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    sessions = [QuizSession(f"player{i}", "medium", len(questions)) for i in range(args.sessions)]
+    for session in sessions:
+        session.start(questions)
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"create + start {args.sessions} sessions  {elapsed:6.2f} s  {memory / args.sessions:6.0f} bytes each")
+
+    events = 0
+    start = time.perf_counter()
+    now = 0.0
+    while sessions[0].state != FINISHED:
+        for session in sessions:
+            question = session.ask(now)
+            roll = rng.random()
+            if roll < 0.1:
+                session.timeout()
+            else:
+                session.answer(question["answer"] if roll < 0.7 else "wrong", now + 1)
+            events += 2
+        now += 20
+    elapsed = time.perf_counter() - start
+    print(f"play {args.questions} questions each       {elapsed:6.2f} s  {events / elapsed:10,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
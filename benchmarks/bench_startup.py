@@ -0,0 +1,58 @@
+# Compares loading a question bank by parsing its JSON source with loading
+# the precompiled snapshot (including the content-hash staleness check).
+#
+# Usage: python -m benchmarks.bench_startup --items 100000
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from live_bank import LiveQuestionBank
+from mock_server import make_question
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<32} {(time.perf_counter() - start) * 1000:8.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark question bank startup.")
+    parser.add_argument("--items", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    bank = {"easy": [], "medium": [], "hard": []}
+    for i in range(args.items):
+        difficulty = rng.choice(list(bank))
+        question = make_question(difficulty, rng)
+        question["question"] += f" (#{i})"
+        bank[difficulty].append(question)
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "questions.json")
+        snapshot = os.path.join(directory, "questions.snapshot")
+        with open(source, "w") as file:
+            json.dump(bank, file)
+
+        cold = LiveQuestionBank([source], snapshot_path=snapshot)
+        timed("parse JSON source", cold.reload)
+        timed("write snapshot", cold.save_snapshot)
+        print(f"{'source / snapshot size':<32} {os.path.getsize(source) / 1e6:6.1f} MB / {os.path.getsize(snapshot) / 1e6:.1f} MB")
+
+        warm = LiveQuestionBank([source], snapshot_path=snapshot)
+        loaded = timed("load snapshot", warm.load_snapshot)
+        print(f"{'snapshot used':<32} {loaded} ({len(warm)} questions)")
+
+        with open(source, "a") as file:
+            file.write(" ")
+        stale = LiveQuestionBank([source], snapshot_path=snapshot)
+        timed("detect stale snapshot", stale.load_snapshot)
+
+
+if __name__ == "__main__":
+    main()
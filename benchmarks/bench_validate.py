@@ -0,0 +1,44 @@
+# Measures the cost of validating question payloads at ingest, for a bank
+# of mixed valid and malformed items.
+#
+# Usage: python -m benchmarks.bench_validate --items 100000
+import argparse
+import random
+import time
+
+from mock_server import make_question
+from question_schema import filter_valid
+
+
+def make_bank(count, bad_ratio):
+    bank = []
+    for _ in range(count):
+        question = make_question(random.choice(["easy", "medium", "hard"]))
+        if random.random() < bad_ratio:
+            broken = random.choice(["answer", "options", "type"])
+            if broken == "answer":
+                question["answer"] = 42
+            elif broken == "options":
+                question["options"] = "A, B, C"
+            else:
+                question["type"] = "essay"
+        bank.append(question)
+    return bank
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark question payload validation.")
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--bad-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    bank = make_bank(args.items, args.bad_ratio)
+    start = time.perf_counter()
+    valid = filter_valid(bank)
+    elapsed = time.perf_counter() - start
+    print(f"validated {len(bank)} items in {elapsed * 1000:.1f} ms "
+          f"({elapsed / len(bank) * 1e6:.2f} us/item), {len(bank) - len(valid)} rejected")
+
+
+if __name__ == "__main__":
+    main()
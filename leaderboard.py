@@ -0,0 +1,516 @@
+# The leaderboard file: one "name,score,difficulty" line per finished round.
+#
+# Several game instances (kiosks, the server) may share one file, so:
+#   - each batch of results is one os.write to a descriptor opened with
+#     O_APPEND, so lines from different processes never interleave
+#   - writers hold a shared flock on leaderboard.txt.lock while appending;
+#     compaction holds it exclusively
+#   - readers only consume complete lines, so a write in progress is never
+#     seen half-done
+#   - names are claimed when a round starts, under the exclusive lock, in
+#     leaderboard.txt.names, so two kiosks cannot both take a name. A claim
+#     is released if the round is abandoned and lapses after CLAIM_SECONDS
+#     anyway, so a crashed kiosk does not hold a name for good
+#
+# Compaction rewrites the log as a snapshot sorted by score, through a
+# temporary file and a rename, so readers see the old file or the new one
+# and nothing in between. The lock file records which file replaced which
+# and how long the snapshot is, so a reader that had read the old file to
+# its end can carry on after the snapshot instead of starting again.
+import argparse
+import fcntl
+import heapq
+import os
+import stat
+import threading
+import time
+from contextlib import contextmanager
+from operator import itemgetter
+
+from score_rank import ScoreRanks, placement_from
+
+LEADERBOARD_FILE = "leaderboard.txt"
+LOCK_SUFFIX = ".lock"
+CLAIMS_SUFFIX = ".names"
+# How long a claimed name stays taken without a result
+CLAIM_SECONDS = 3600.0
+TOP_SIZE = 5
+REFRESH_INTERVAL = 1.0
+COMPACT_INTERVAL = 60.0
+COMPACT_AFTER_BYTES = 1 << 20
+WRITE_INTERVAL = 1.0
+
+
+# Names are unique ignoring case
+def name_key(name):
+    return name.strip().casefold()
+
+
+# A line break would start a row of its own and a comma after the name
+# would shift the columns, so those become spaces (names may keep commas:
+# rows are split from the right)
+# Claims file lines are "claimed_at,name", or "-,name" when a claim is
+# released; (name key, claimed_at or None)
+def format_claim(name, claimed_at=None):
+    return f"{'-' if claimed_at is None else f'{claimed_at:.0f}'},{name.strip()}\n"
+
+
+def parse_claim(line):
+    stamp, _, name = line.partition(",")
+    if stamp == "-":
+        return name_key(name), None
+    try:
+        return name_key(name), float(stamp)
+    except ValueError:
+        # A bare name from before claims lapsed: long expired
+        return name_key(line), 0.0
+
+
+def format_result(name, score, difficulty):
+    name = " ".join(str(name).splitlines())
+    difficulty = " ".join(str(difficulty).replace(",", " ").split())
+    return f"{name},{int(score)},{difficulty}\n"
+
+
+@contextmanager
+def locked(path=LEADERBOARD_FILE, exclusive=False):
+    fd = os.open(path + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield fd
+    finally:
+        os.close(fd)
+
+
+def append_bytes(path, data, sync=False):
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+    try:
+        # One write per batch; the loop only matters if the disk fills up
+        while data:
+            data = data[os.write(fd, data):]
+        if sync:
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# Many results (e.g. a whole multiplayer lobby) go out in one write
+def append_results(rows, path=LEADERBOARD_FILE, sync=False):
+    data = "".join(format_result(name, score, difficulty) for name, score, difficulty in rows).encode()
+    with locked(path):
+        append_bytes(path, data, sync)
+
+
+# Names may contain commas, so the score and difficulty are split off the end.
+# Returns None for lines that are not a result.
+def parse_result(line):
+    parts = line.strip().rsplit(",", 2)
+    if len(parts) != 3:
+        return None
+    name, score, difficulty = parts
+    try:
+        return name.strip(), int(score), difficulty.strip()
+    except ValueError:
+        return None
+
+
+def read_results(path=LEADERBOARD_FILE):
+    with open(path, "r") as file:
+        return [row for row in map(parse_result, file) if row is not None]
+
+
+def parse_lines(data):
+    return [row for row in map(parse_result, data.decode(errors="replace").splitlines()) if row is not None]
+
+
+# (replaced inode, new inode, snapshot length) of the last compaction
+def read_compaction(path=LEADERBOARD_FILE):
+    try:
+        with open(path + LOCK_SUFFIX, "r") as file:
+            old_inode, new_inode, length = map(int, file.read().split())
+        return old_inode, new_inode, length
+    except (OSError, ValueError):
+        return None
+
+
+# Rewrites the log sorted by score (ties keep their order); returns the
+# number of results kept
+def compact(path=LEADERBOARD_FILE):
+    with locked(path, exclusive=True) as lock_fd:
+        try:
+            old = os.stat(path)
+        except FileNotFoundError:
+            return 0
+        rows = read_results(path)
+        rows.sort(key=itemgetter(1), reverse=True)
+        data = "".join(format_result(name, score, difficulty) for name, score, difficulty in rows).encode()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(tmp_path, stat.S_IMODE(old.st_mode))
+        os.replace(tmp_path, path)
+        record = f"{old.st_ino} {os.stat(path).st_ino} {len(data)}\n".encode()
+        os.ftruncate(lock_fd, 0)
+        os.pwrite(lock_fd, record, 0)
+    return len(rows)
+
+
+# The leaderboard file held in memory: the file is read once, and after
+# that a background thread reads only what other processes (or this one)
+# have appended since, so queries never wait on the disk. Names
+# are a set of name keys, and the best results overall and per difficulty
+# are bounded min-heaps of capacity entries, so checking a name is O(1)
+# and the top results are read without parsing the file again.
+#
+# Placements per difficulty come from a ScoreRanks count of every score.
+#
+# Heap entries are (score, -sequence, row): the root is the lowest score
+# and, among equal scores, the latest result, so ties keep the order of
+# the file like the old full sort did.
+class LeaderboardIndex:
+    def __init__(self, path=LEADERBOARD_FILE, capacity=TOP_SIZE, refresh_interval=REFRESH_INTERVAL,
+                 compact_interval=COMPACT_INTERVAL, compact_after=COMPACT_AFTER_BYTES):
+        self.path = path
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.compact_interval = compact_interval
+        self.compact_after = compact_after
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.loaded = threading.Event()
+        self.file = None
+        self.inode = None
+        self.offset = 0
+        self.claims_offset = 0
+        self._reset()
+
+    def _reset(self):
+        self.names = set()
+        self.claims = {}
+        self.best = []
+        self.best_by_difficulty = {}
+        self.rows = 0
+        self.counts = {}
+        self.ranks = ScoreRanks()
+        self.offset = 0
+        self.claims_offset = 0
+
+    # Loads the file, picks up other processes' results every
+    # refresh_interval and compacts it now and then, all in the background
+    def start(self):
+        threading.Thread(target=self._maintain, name="leaderboard-maintainer", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _maintain(self):
+        checked = 0.0
+        while True:
+            try:
+                self.refresh()
+                if time.monotonic() - checked >= self.compact_interval:
+                    checked = time.monotonic()
+                    if self.needs_compaction():
+                        compact(self.path)
+            except Exception as e:
+                print(f"Error maintaining leaderboard: {e}")
+            if self.stopped.wait(self.refresh_interval):
+                return
+
+    def needs_compaction(self):
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        record = read_compaction(self.path)
+        snapshot = record[2] if record and record[1] == current.st_ino else 0
+        return current.st_size - snapshot >= self.compact_after
+
+    def load(self):
+        self.refresh()
+        return self
+
+    def refresh(self):
+        with locked(self.path), self.lock:
+            self._refresh()
+
+    # Callers hold the file lock, so the file cannot be replaced meanwhile
+    def _refresh(self):
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if self.file is not None and inode != self.inode:
+            # Compacted: finish the old file, which no longer changes, then
+            # skip the snapshot of it if it replaced exactly that file
+            self._read_new()
+            self.file.close()
+            self.file = None
+            record = read_compaction(self.path)
+            if record and record[:2] == (self.inode, inode):
+                self.offset = record[2]
+            else:
+                self._reset()
+        if self.file is None and inode is not None:
+            self.file = open(self.path, "rb")
+            self.inode = os.fstat(self.file.fileno()).st_ino
+        if self.file is not None:
+            self._read_new()
+        self._read_claims()
+        self.loaded.set()
+
+    # Queries answer from memory; only the first one may have to load the file
+    def _wait_loaded(self):
+        if not self.loaded.is_set():
+            self.refresh()
+
+    def _read_new(self):
+        self.file.seek(self.offset)
+        data = self.file.read()
+        end = data.rfind(b"\n") + 1
+        if end:
+            self.offset += end
+            self._index(parse_lines(data[:end]))
+
+    def _read_claims(self):
+        try:
+            with open(self.path + CLAIMS_SUFFIX, "rb") as file:
+                file.seek(self.claims_offset)
+                data = file.read()
+        except FileNotFoundError:
+            return
+        end = data.rfind(b"\n") + 1
+        self.claims_offset += end
+        for key, claimed_at in map(parse_claim, data[:end].decode(errors="replace").splitlines()):
+            if claimed_at is None:
+                self.claims.pop(key, None)
+            else:
+                self.claims[key] = claimed_at
+
+    def _claimed(self, key):
+        return self.claims.get(key, -CLAIM_SECONDS) > time.time() - CLAIM_SECONDS
+
+    def _index(self, rows):
+        entries = [(row[1], -i, row) for i, row in enumerate(rows, self.rows)]
+        self.rows += len(rows)
+        # Rows come from parse_result, so names are already stripped
+        self.names.update(map(str.casefold, map(itemgetter(0), rows)))
+        self.best = self._merge(self.best, entries)
+        by_difficulty = {}
+        for entry in entries:
+            by_difficulty.setdefault(entry[2][2], []).append(entry)
+        for difficulty, group in by_difficulty.items():
+            self.counts[difficulty] = self.counts.get(difficulty, 0) + len(group)
+            self.ranks.add_many(difficulty, [entry[0] for entry in group])
+            self.best_by_difficulty[difficulty] = self._merge(self.best_by_difficulty.get(difficulty, []), group)
+
+    def _merge(self, heap, entries):
+        if len(entries) <= self.capacity:
+            for entry in entries:
+                if len(heap) < self.capacity:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+            return heap
+        merged = heapq.nlargest(self.capacity, heap + entries)
+        heapq.heapify(merged)
+        return merged
+
+    # The appended lines are indexed by reading them back, like anyone else's
+    def add_many(self, rows, sync=False):
+        append_results([(name.strip(), score, difficulty) for name, score, difficulty in rows], self.path, sync)
+        self.refresh()
+
+    def add(self, name, score, difficulty):
+        self.add_many([(name, score, difficulty)])
+
+    def name_exists(self, name):
+        self._wait_loaded()
+        key = name_key(name)
+        return key in self.names or self._claimed(key)
+
+    # Whether a result under this name has been saved, not just claimed
+    def has_result(self, name):
+        self._wait_loaded()
+        return name_key(name) in self.names
+
+    # Reserves a name for a round that is starting; False if it is taken
+    def claim_name(self, name):
+        key = name_key(name)
+        with locked(self.path, exclusive=True), self.lock:
+            self._refresh()
+            if key in self.names or self._claimed(key):
+                return False
+            append_bytes(self.path + CLAIMS_SUFFIX, format_claim(name, time.time()).encode())
+            self._read_claims()
+        return True
+
+    # Gives back the claim of a round that ended without a result
+    def release_name(self, name):
+        with locked(self.path), self.lock:
+            append_bytes(self.path + CLAIMS_SUFFIX, format_claim(name).encode())
+            self._read_claims()
+
+    # [(name, score, difficulty)], best first; k is at most capacity
+    def top(self, k=TOP_SIZE, difficulty=None):
+        self._wait_loaded()
+        with self.lock:
+            heap = self.best if difficulty is None else self.best_by_difficulty.get(difficulty, [])
+            return [entry[2] for entry in sorted(heap, reverse=True)[:k]]
+
+    # (results above score, results) for the difficulty
+    def standing(self, score, difficulty):
+        self._wait_loaded()
+        with self.lock:
+            return self.ranks.above(difficulty, score), self.ranks.total(difficulty)
+
+    # (place, out of, top percent) of score among the difficulty's results
+    def placement(self, score, difficulty):
+        return placement_from(*self.standing(score, difficulty))
+
+    def count(self, difficulty=None):
+        self._wait_loaded()
+        return self.rows if difficulty is None else self.counts.get(difficulty, 0)
+
+
+# Write-behind in front of a leaderboard (a LeaderboardIndex or a
+# LeaderboardStore): saved results are queued and a background thread
+# writes them in batches every interval seconds, with fsync, so a slow or
+# network disk never holds up the UI. Queries answer from the leaderboard
+# plus whatever is still queued, so a result shows up the moment it is
+# saved. close() writes out what is left.
+#
+# A batch being written is moved out of the queue and the lock is released
+# for the write, so queries never wait on the disk. The leaderboard may show
+# the batch's results part-way through the write, so queries leave out the
+# ones it already has (see _queued).
+class LeaderboardWriter:
+    def __init__(self, leaderboard, interval=WRITE_INTERVAL):
+        self.leaderboard = leaderboard
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.pending = []
+        self.writing = []
+        self.batches = 0
+        # Only one batch is written at a time, in order
+        self.flush_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="leaderboard-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                if not self.pending:
+                    return
+                self.writing, self.pending = self.pending, []
+                self.batches += 1
+            try:
+                self.leaderboard.add_many(self.writing, sync=True)
+                with self.lock:
+                    self.writing = []
+            except Exception as e:
+                # Queued again, ahead of newer results, and tried on the next flush
+                print(f"Error saving leaderboard: {e}")
+                with self.lock:
+                    self.writing, self.pending = [], self.writing + self.pending
+
+    # Runs query against the leaderboard and returns its answer with the
+    # queued results it does not include yet. Results being written are
+    # checked before and after the query; if any appeared in between, or
+    # another batch started, the query runs again.
+    def _queued(self, query):
+        while True:
+            with self.lock:
+                pending = self.pending
+                writing = self.writing
+                batches = self.batches
+            saved = [self.leaderboard.has_result(row[0]) for row in writing]
+            answer = query()
+            if [self.leaderboard.has_result(row[0]) for row in writing] != saved:
+                continue
+            with self.lock:
+                if self.batches != batches:
+                    continue
+            return answer, [row for row, done in zip(writing, saved) if not done] + pending
+
+    def close(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+        stop = getattr(self.leaderboard, "stop", None)
+        if stop:
+            stop()
+
+    # pending is replaced rather than extended, so a query's copy of it never changes
+    def add_many(self, rows):
+        with self.lock:
+            self.pending = self.pending + [(name.strip(), score, difficulty) for name, score, difficulty in rows]
+
+    def add(self, name, score, difficulty):
+        self.add_many([(name, score, difficulty)])
+
+    def _queued_name(self, name):
+        key = name_key(name)
+        with self.lock:
+            return any(name_key(row[0]) == key for row in self.writing + self.pending)
+
+    def name_exists(self, name):
+        return self._queued_name(name) or self.leaderboard.name_exists(name)
+
+    def has_result(self, name):
+        return self._queued_name(name) or self.leaderboard.has_result(name)
+
+    def claim_name(self, name):
+        if self._queued_name(name):
+            return False
+        return self.leaderboard.claim_name(name)
+
+    def release_name(self, name):
+        self.leaderboard.release_name(name)
+
+    # Queued results go after saved ones with the same score, as they came later
+    def top(self, k=TOP_SIZE, difficulty=None):
+        saved, queued = self._queued(lambda: self.leaderboard.top(k, difficulty))
+        queued = [row for row in queued if difficulty is None or row[2] == difficulty]
+        return sorted(saved + queued, key=itemgetter(1), reverse=True)[:k]
+
+    def standing(self, score, difficulty):
+        (above, total), queued = self._queued(lambda: self.leaderboard.standing(score, difficulty))
+        queued = [row[1] for row in queued if row[2] == difficulty]
+        return above + sum(1 for queued_score in queued if queued_score > score), total + len(queued)
+
+    def placement(self, score, difficulty):
+        return placement_from(*self.standing(score, difficulty))
+
+    def count(self, difficulty=None):
+        saved, queued = self._queued(lambda: self.leaderboard.count(difficulty))
+        return saved + sum(1 for row in queued if difficulty is None or row[2] == difficulty)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard file tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compactor = commands.add_parser("compact", help="rewrite the leaderboard file sorted by score")
+    compactor.add_argument("path", nargs="?", default=LEADERBOARD_FILE)
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(f"Compacted {args.path}: {compact(args.path)} results")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# Leaderboard kept in SQLite instead of the leaderboard.txt log. Names are
+# unique ignoring case (through a casefolded key column), and scores are
+# indexed both overall and per difficulty, so checking a name and reading
+# the top 5 are index lookups instead of a scan and sort of every result.
+# The database runs in WAL mode, so readers are not blocked by a writer:
+# queries go through a connection of their own, so they never wait on a
+# commit (and its fsync) in progress on the writing one.
+#
+# A player has one row holding their best score; saving a lower score for
+# a name that is already there leaves the row as it is.
+#
+# Triggers keep a score_counts table (players per difficulty and score) in
+# step with results. Scores only span a small range, so a placement sums a
+# handful of rows instead of counting every player above.
+#
+# Migrate an existing leaderboard.txt once (the game uses leaderboard.db
+# from then on):
+#   python leaderboard_store.py import leaderboard.txt -o leaderboard.db
+import argparse
+import os
+import sqlite3
+import threading
+import time
+
+from leaderboard import CLAIM_SECONDS, LEADERBOARD_FILE, TOP_SIZE, LeaderboardIndex, name_key, parse_result
+from score_rank import placement_from
+
+LEADERBOARD_DB = "leaderboard.db"
+IMPORT_BATCH = 10000
+# The outer INSERT's conflict policy would override an OR IGNORE in a
+# trigger, so missing score_counts rows are created with NOT EXISTS
+SCORE_COUNT_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS results_counted AFTER INSERT ON results BEGIN
+    INSERT INTO score_counts SELECT NEW.difficulty, NEW.score, 0 WHERE NOT EXISTS
+        (SELECT 1 FROM score_counts WHERE difficulty = NEW.difficulty AND score = NEW.score);
+    UPDATE score_counts SET players = players + 1 WHERE difficulty = NEW.difficulty AND score = NEW.score;
+END;
+CREATE TRIGGER IF NOT EXISTS results_recounted AFTER UPDATE OF score, difficulty ON results BEGIN
+    UPDATE score_counts SET players = players - 1 WHERE difficulty = OLD.difficulty AND score = OLD.score;
+    INSERT INTO score_counts SELECT NEW.difficulty, NEW.score, 0 WHERE NOT EXISTS
+        (SELECT 1 FROM score_counts WHERE difficulty = NEW.difficulty AND score = NEW.score);
+    UPDATE score_counts SET players = players + 1 WHERE difficulty = NEW.difficulty AND score = NEW.score;
+END;
+CREATE TRIGGER IF NOT EXISTS results_uncounted AFTER DELETE ON results BEGIN
+    UPDATE score_counts SET players = players - 1 WHERE difficulty = OLD.difficulty AND score = OLD.score;
+END;
+"""
+
+
+class LeaderboardStore:
+    def __init__(self, path=LEADERBOARD_DB):
+        self.lock = threading.Lock()
+        self.read_lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " id INTEGER PRIMARY KEY,"
+                " name_key TEXT NOT NULL,"
+                " name TEXT NOT NULL,"
+                " score INTEGER NOT NULL,"
+                " difficulty TEXT NOT NULL,"
+                " saved_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS results_name ON results (name_key)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS results_difficulty_score ON results (difficulty, score DESC)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS results_score ON results (score DESC)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS claims (name_key TEXT PRIMARY KEY, claimed_at REAL NOT NULL)")
+            counted = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'score_counts'"
+            ).fetchone()
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS score_counts ("
+                " difficulty TEXT NOT NULL,"
+                " score INTEGER NOT NULL,"
+                " players INTEGER NOT NULL,"
+                " PRIMARY KEY (difficulty, score)) WITHOUT ROWID"
+            )
+            self.conn.executescript(SCORE_COUNT_TRIGGERS)
+            if not counted:
+                # A database from before score_counts existed
+                self.conn.execute(
+                    "INSERT INTO score_counts SELECT difficulty, score, COUNT(*) FROM results GROUP BY difficulty, score"
+                )
+        # Opened once the tables exist
+        self.reader = sqlite3.connect(path, check_same_thread=False)
+
+    # sync makes this commit durable on its own rather than at the next checkpoint
+    def add_many(self, rows, sync=False):
+        now = time.time()
+        with self.lock:
+            if sync:
+                self.conn.execute("PRAGMA synchronous=FULL")
+            try:
+                with self.conn:
+                    self.conn.executemany(
+                        "INSERT INTO results (name_key, name, score, difficulty, saved_at) VALUES (?, ?, ?, ?, ?)"
+                        " ON CONFLICT(name_key) DO UPDATE SET name = excluded.name, score = excluded.score,"
+                        " difficulty = excluded.difficulty, saved_at = excluded.saved_at"
+                        " WHERE excluded.score > results.score",
+                        ((name_key(name), name.strip(), score, difficulty, now) for name, score, difficulty in rows),
+                    )
+            finally:
+                if sync:
+                    self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def add(self, name, score, difficulty):
+        self.add_many([(name, score, difficulty)])
+
+    def name_exists(self, name):
+        key = name_key(name)
+        with self.read_lock:
+            row = self.reader.execute(
+                "SELECT 1 FROM results WHERE name_key = ?"
+                " UNION ALL SELECT 1 FROM claims WHERE name_key = ? AND claimed_at > ?",
+                (key, key, time.time() - CLAIM_SECONDS),
+            ).fetchone()
+        return row is not None
+
+    # Whether a result under this name has been saved, not just claimed
+    def has_result(self, name):
+        with self.read_lock:
+            row = self.reader.execute("SELECT 1 FROM results WHERE name_key = ?", (name_key(name),)).fetchone()
+        return row is not None
+
+    # Reserves a name for a round that is starting; False if it is taken.
+    # The claims primary key settles two games claiming at the same time;
+    # a claim older than CLAIM_SECONDS is cleared first.
+    def claim_name(self, name):
+        key = name_key(name)
+        now = time.time()
+        with self.lock, self.conn:
+            if self.conn.execute("SELECT 1 FROM results WHERE name_key = ?", (key,)).fetchone():
+                return False
+            self.conn.execute("DELETE FROM claims WHERE name_key = ? AND claimed_at <= ?", (key, now - CLAIM_SECONDS))
+            return self.conn.execute("INSERT OR IGNORE INTO claims VALUES (?, ?)", (key, now)).rowcount == 1
+
+    # Gives back the claim of a round that ended without a result
+    def release_name(self, name):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM claims WHERE name_key = ?", (name_key(name),))
+
+    # [(name, score, difficulty)], best first; ties go to whoever got there first
+    def top(self, k=TOP_SIZE, difficulty=None):
+        with self.read_lock:
+            if difficulty is None:
+                return self.reader.execute(
+                    "SELECT name, score, difficulty FROM results ORDER BY score DESC, id LIMIT ?", (k,)
+                ).fetchall()
+            return self.reader.execute(
+                "SELECT name, score, difficulty FROM results WHERE difficulty = ? ORDER BY score DESC, id LIMIT ?",
+                (difficulty, k),
+            ).fetchall()
+
+    # (players above score, players) for the difficulty
+    def standing(self, score, difficulty):
+        with self.read_lock:
+            return self.reader.execute(
+                "SELECT COALESCE(SUM(CASE WHEN score > ? THEN players END), 0), COALESCE(SUM(players), 0)"
+                " FROM score_counts WHERE difficulty = ?",
+                (score, difficulty),
+            ).fetchone()
+
+    # (place, out of, top percent) of score among the difficulty's players
+    def placement(self, score, difficulty):
+        return placement_from(*self.standing(score, difficulty))
+
+    def count(self, difficulty=None):
+        with self.read_lock:
+            if difficulty is None:
+                return self.reader.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            return self.reader.execute("SELECT COUNT(*) FROM results WHERE difficulty = ?", (difficulty,)).fetchone()[0]
+
+    # Streams a leaderboard.txt file in, in batches; returns (results read,
+    # players added, malformed lines skipped). Results for a name that is
+    # already there are merged into its row, so fewer players than results
+    # may be added.
+    def import_file(self, path=LEADERBOARD_FILE):
+        before = self.count()
+        imported = skipped = 0
+        batch = []
+        with open(path, "r") as file:
+            for line in file:
+                row = parse_result(line)
+                if row is None or not row[0]:
+                    skipped += line.strip() != ""
+                    continue
+                batch.append(row)
+                if len(batch) >= IMPORT_BATCH:
+                    self.add_many(batch)
+                    imported += len(batch)
+                    batch = []
+        self.add_many(batch)
+        return imported + len(batch), self.count() - before, skipped
+
+    def close(self):
+        with self.lock, self.read_lock:
+            self.conn.close()
+            self.reader.close()
+
+
+# Once leaderboard.txt has been imported into a database, results are read
+# from and saved to the database; otherwise the file is loaded into memory
+# in the background. The game and the server both open it this way.
+def open_leaderboard(path=LEADERBOARD_FILE, db_path=LEADERBOARD_DB):
+    if os.path.exists(db_path):
+        try:
+            return LeaderboardStore(db_path)
+        except Exception as e:
+            print(f"Error opening leaderboard database: {e}")
+    return LeaderboardIndex(path).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite leaderboard tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="migrate leaderboard.txt files into the database")
+    importer.add_argument("sources", nargs="+")
+    importer.add_argument("-o", "--output", default=LEADERBOARD_DB)
+    top = commands.add_parser("top", help="print the best results")
+    top.add_argument("--db", default=LEADERBOARD_DB)
+    top.add_argument("-k", type=int, default=TOP_SIZE)
+    top.add_argument("--difficulty")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        store = LeaderboardStore(args.output)
+        for path in args.sources:
+            try:
+                imported, added, skipped = store.import_file(path)
+                merged = imported - added
+                print(f"Imported {imported} results from {path} as {added} new players"
+                      + (f" ({merged} merged into players with the same name)" if merged else "")
+                      + (f" ({skipped} malformed lines skipped)" if skipped else ""))
+            except OSError as e:
+                print(f"Error importing {path}: {e}")
+        print(f"{store.count()} players in {args.output}")
+        store.close()
+    elif args.command == "top":
+        store = LeaderboardStore(args.db)
+        for i, (name, score, difficulty) in enumerate(store.top(args.k, args.difficulty), 1):
+            print(f"{i}. {name} - {score} pts ({difficulty})")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+# In-memory question bank built from the JSON/CSV files authors edit, kept
+# up to date while the app runs. A background thread polls the files' mtime
+# and size; when one changes, only its new or changed records are parsed and
+# only the index lists they touch are copied and patched. The result is
+# published with a single reference swap, so readers always see a complete
+# snapshot and the UI thread never waits on a reload.
+#
+# JSON Lines (.jsonl/.ndjson) and CSV files are diffed line by line, so a
+# record must fit on one line. Plain .json files are parsed whole and diffed
+# record by record.
+#
+# Parsing a large bank is the slow part of startup, so the parsed state is
+# also saved as a marshal snapshot stamped with a SHA-256 of every source
+# file. At startup the snapshot is used only if those hashes still match;
+# otherwise the sources are parsed again and the snapshot rewritten.
+# Build one ahead of time (e.g. before packaging with quiz_game.spec):
+#   python live_bank.py snapshot questions.json questions.csv -o questions.snapshot
+#
+# With a near-duplicate index, new records that only reword a question
+# already in the index are skipped (and reported) instead of published.
+# Skips are not saved: a skipped line is checked again when its file
+# changes or a record it may have duplicated is removed.
+import argparse
+import csv
+import hashlib
+import json
+import marshal
+import os
+import random
+import struct
+import sys
+import threading
+from array import array
+
+from question_bank import QuestionBank, csv_row_to_question, filter_items, index_keys, sample_intersection, table_key
+from question_schema import validate_question
+
+BANK_POLL_SECONDS = 2.0
+ALL_RECORDS = "*"
+LINE_FORMATS = (".jsonl", ".ndjson")
+SNAPSHOT_FILE = "questions.snapshot"
+SNAPSHOT_MAGIC = b"QSNP"
+SNAPSHOT_VERSION = 1
+
+
+class BankSnapshot:
+    __slots__ = ("records", "postings", "generation")
+
+    def __init__(self, records, postings, generation):
+        self.records = records
+        self.postings = postings
+        self.generation = generation
+
+    def __len__(self):
+        return len(self.records)
+
+    def count(self, field, value):
+        return len(self.postings.get(table_key(field, value), ()))
+
+    def ids(self, field, value):
+        return self.postings.get(table_key(field, value), [])
+
+    def labels(self, field):
+        names = [key.split("=", 1)[1] for key in self.postings if key.startswith(field + "=")]
+        numbers = array("I", [0]) * (max(self.records, default=-1) + 1)
+        for number, name in enumerate(names, 1):
+            for record_id in self.ids(field, name):
+                numbers[record_id] = number
+        return numbers, [None] + names
+
+    def get(self, record_id):
+        return self.records[record_id]
+
+    def sample(self, difficulty, k, rng=random):
+        return self.sample_where(k, rng, difficulty=difficulty)
+
+    def sample_where(self, k, rng=random, **filters):
+        postings = [self.ids(field, value) for field, value in filter_items(filters)]
+        ids = sample_intersection(postings or [self.postings.get(ALL_RECORDS, [])], k, rng)
+        return [self.records[record_id] for record_id in ids]
+
+
+def read_records(path):
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as file:
+            lines = file.read().splitlines()
+        header = next(csv.reader(lines[:1]), [])
+        parse = lambda line: csv_row_to_question(dict(zip(header, next(csv.reader([line])))))
+        return tuple(header), lines[1:], parse
+    if path.lower().endswith(LINE_FORMATS):
+        with open(path, "rb") as file:
+            return None, file.read().splitlines(), json.loads
+
+    with open(path) as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        data = [dict(item, difficulty=difficulty) for difficulty, items in data.items() for item in items]
+    return None, [json.dumps(item, sort_keys=True) for item in data], json.loads
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_digest(path):
+    try:
+        with open(path, "rb") as file:
+            return hashlib.file_digest(file, "sha256").hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+# Anything that makes a snapshot unusable: format, Python (marshal is
+# version specific) and the exact contents of every source file. Missing
+# files are left out, so a snapshot built from just the files that exist
+# matches an app that also watches for ones that do not.
+def snapshot_stamp(paths):
+    digests = {os.path.normpath(path): file_digest(path) for path in paths}
+    return {
+        "format": SNAPSHOT_VERSION,
+        "python": tuple(sys.version_info[:2]),
+        "sources": {path: digest for path, digest in digests.items() if digest is not None},
+    }
+
+
+class LiveQuestionBank:
+    def __init__(self, paths, poll_interval=BANK_POLL_SECONDS, snapshot_path=None, near_dups=None):
+        # Normalised so "./questions.json" and "questions.json" share snapshot entries
+        self.paths = [os.path.normpath(path) for path in paths]
+        self.poll_interval = poll_interval
+        self.snapshot_path = snapshot_path
+        self.near_dups = near_dups
+        self.snapshot = BankSnapshot({}, {}, 0)
+        self.files = {}
+        self.next_id = 0
+        self.reload_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.skipped_paths = set()
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    @property
+    def generation(self):
+        return self.snapshot.generation
+
+    # A consistent view for callers that read several times (ids, then get)
+    def current(self):
+        return self.snapshot
+
+    def count(self, field, value):
+        return self.snapshot.count(field, value)
+
+    def ids(self, field, value):
+        return self.snapshot.ids(field, value)
+
+    def labels(self, field):
+        return self.snapshot.labels(field)
+
+    def get(self, record_id):
+        return self.snapshot.get(record_id)
+
+    def sample(self, difficulty, k, rng=random):
+        return self.snapshot.sample(difficulty, k, rng)
+
+    def sample_where(self, k, rng=random, **filters):
+        return self.snapshot.sample_where(k, rng, **filters)
+
+    def start(self):
+        threading.Thread(target=self._watch, name="bank-watcher", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def _watch(self):
+        if self.snapshot_path and not self.load_snapshot():
+            self.reload()
+            self.save_snapshot()
+        while not self.stopped.is_set():
+            try:
+                added, removed = self.reload()
+                if (added or removed) and self.snapshot_path:
+                    self.save_snapshot()
+            except Exception as e:
+                print(f"Error reloading question bank: {e}")
+            self.stopped.wait(self.poll_interval)
+
+    def load_snapshot(self):
+        try:
+            with open(self.snapshot_path, "rb") as file:
+                if file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                    return False
+                (stamp_length,) = struct.unpack("<I", file.read(4))
+                stamp = marshal.loads(file.read(stamp_length))
+                # Stat before hashing: an edit in between shows up as a new signature on the next poll
+                signatures = {path: file_signature(path) for path in self.paths}
+                if stamp != snapshot_stamp(self.paths):
+                    print("Question bank snapshot is stale, parsing the source files instead.")
+                    return False
+                # loads() on the whole buffer is much faster than load() on the file
+                data = marshal.loads(file.read())
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Error reading question bank snapshot: {e}")
+            return False
+
+        with self.reload_lock:
+            self.files = {path: (signatures[path], header, current) for path, (header, current) in data["files"].items()}
+            self.next_id = data["next_id"]
+            self.snapshot = BankSnapshot(data["records"], data["postings"], self.snapshot.generation + 1)
+            # Which files had lines skipped is not saved, so any of them might
+            self.skipped_paths = set(self.files)
+            if self.near_dups is not None:
+                # Records in the snapshot were checked when they were first parsed
+                self.near_dups.add_many((record_id, q["question"]) for record_id, q in data["records"].items())
+        return True
+
+    def save_snapshot(self, path=None):
+        path = path or self.snapshot_path
+        with self.reload_lock:
+            stamp = marshal.dumps(snapshot_stamp(self.paths))
+            data = {
+                "files": {source: (header, current) for source, (_, header, current) in self.files.items()},
+                "next_id": self.next_id,
+                "records": self.snapshot.records,
+                "postings": self.snapshot.postings,
+            }
+            try:
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as file:
+                    file.write(SNAPSHOT_MAGIC + struct.pack("<I", len(stamp)) + stamp)
+                    marshal.dump(data, file)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                print(f"Error saving question bank snapshot: {e}")
+
+    def reload(self):
+        with self.reload_lock:
+            added = {}
+            origins = {}
+            removed = set()
+            files = {}
+            for path in self.paths:
+                signature = file_signature(path)
+                known_signature, known_header, known = self.files.get(path, (None, None, {}))
+                if signature == known_signature:
+                    continue
+
+                try:
+                    header, lines, parse = read_records(path) if signature else (None, [], None)
+                except Exception as e:
+                    # Probably caught mid-save; the next poll will see the finished file
+                    print(f"Error reading question bank {path}: {e}")
+                    continue
+                if header != known_header:
+                    known_ids = [record_id for record_id in known.values() if record_id is not None]
+                    removed.update(known_ids)
+                    known = {}
+                current = {}
+                for line in lines:
+                    if line in current or not line.strip():
+                        continue
+                    if line in known:
+                        current[line] = known[line]
+                        continue
+                    try:
+                        question = parse(line)
+                    except (ValueError, csv.Error):
+                        question = None
+                    if validate_question(question):
+                        question.setdefault("difficulty", "easy")
+                        current[line] = self.next_id
+                        added[self.next_id] = question
+                        origins[self.next_id] = (path, current, line)
+                        self.next_id += 1
+                    else:
+                        # Remember bad lines so they are not parsed again
+                        current[line] = None
+                removed.update(record_id for line, record_id in known.items()
+                               if record_id is not None and line not in current)
+                files[path] = (signature, header, current)
+
+            if self.near_dups is not None:
+                self._drop_near_duplicates(added, removed, origins)
+            if added or removed:
+                self._publish(added, removed)
+            self.files.update(files)
+            if removed and self.skipped_paths:
+                # Forget the signatures so the skipped lines are parsed and checked again next poll
+                for path in self.skipped_paths:
+                    _, header, current = self.files[path]
+                    self.files[path] = (None, header, current)
+                self.skipped_paths.clear()
+            return len(added), len(removed)
+
+    # Removed records leave the index first, so an edited line is not
+    # mistaken for a rewording of its own previous version
+    def _drop_near_duplicates(self, added, removed, origins):
+        self.near_dups.remove_many(removed)
+        for record_id in sorted(added):
+            question = added[record_id]
+            if self.near_dups.check_and_add(record_id, question["question"]) is None:
+                continue
+            path, current, line = origins[record_id]
+            print(f"Skipping near-duplicate question in {path}: {question['question']}")
+            # Left out of the file's lines rather than remembered as bad
+            del current[line]
+            del added[record_id]
+            self.skipped_paths.add(path)
+
+    # Copies only the index lists that change, then swaps the snapshot in
+    def _publish(self, added, removed):
+        old = self.snapshot
+        records = dict(old.records)
+        postings = dict(old.postings)
+
+        touched = set()
+        for record_id in removed:
+            touched.update(index_keys(records.pop(record_id)))
+        if removed:
+            touched.add(ALL_RECORDS)
+        for key in touched:
+            postings[key] = [record_id for record_id in postings[key] if record_id not in removed]
+
+        # New ids are always larger than existing ones, so appending keeps every list sorted
+        appended = {}
+        for record_id, question in sorted(added.items()):
+            records[record_id] = question
+            for key in index_keys(question) + [ALL_RECORDS]:
+                appended.setdefault(key, []).append(record_id)
+        for key, ids in appended.items():
+            postings[key] = postings.get(key, []) + ids
+
+        postings = {key: ids for key, ids in postings.items() if ids}
+        self.snapshot = BankSnapshot(records, postings, old.generation + 1)
+
+
+# A built .qbank file as is, or the JSON/CSV question files loaded once
+def open_questions(paths):
+    if len(paths) == 1 and paths[0].endswith(".qbank"):
+        return QuestionBank(paths[0])
+    bank = LiveQuestionBank(paths)
+    bank.reload()
+    return bank
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live question bank tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot = commands.add_parser("snapshot", help="precompile question files into a startup snapshot")
+    snapshot.add_argument("sources", nargs="+")
+    snapshot.add_argument("-o", "--output", default=SNAPSHOT_FILE)
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        bank = LiveQuestionBank(args.sources, snapshot_path=args.output)
+        bank.reload()
+        bank.save_snapshot()
+        print(f"Wrote {len(bank)} questions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# Local stand-in for the question API so the client can be tested and
+# benchmarked offline. Serves the per-question endpoint, the batch form
+# (?count=N returns a JSON array) and the streaming form (?count=N&stream=1
+# sends one JSON question per line over a chunked response).
+#
+# Questions come from a JSON file (same shape as local_questions, or a list
+# of items with a "difficulty" key) or are generated. Knobs inject latency,
+# server errors, slow-drip bodies and malformed payloads.
+#
+# Usage: python mock_server.py --port 8000 [--questions bank.json] [--no-batch] [--no-stream]
+#                              [--latency-ms 50 --jitter-ms 20 --latency-dist exponential]
+#                              [--generate-ms 100] [--error-rate 0.05] [--malformed-rate 0.05]
+#                              [--drip-bytes 16 --drip-ms 5] [--seed 1]
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DIFFICULTY_RANGES = {"easy": (1, 10), "medium": (10, 100), "hard": (100, 1000)}
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential")
+
+
+def make_question(difficulty, rng=random):
+    low, high = DIFFICULTY_RANGES.get(difficulty, DIFFICULTY_RANGES["easy"])
+    a, b = rng.randint(low, high), rng.randint(low, high)
+    total = a + b
+    kind = rng.choice(["multiple", "truefalse", "open"])
+    if kind == "multiple":
+        options = [str(total)] + [str(total + delta) for delta in rng.sample([-10, -2, -1, 1, 2, 10], 3)]
+        rng.shuffle(options)
+        return {"type": "multiple", "question": f"What is {a} + {b}?", "options": options, "answer": str(total)}
+    if kind == "truefalse":
+        shown = total if rng.random() < 0.5 else total + rng.choice([-1, 1])
+        return {"type": "truefalse", "question": f"{a} + {b} = {shown}", "answer": str(shown == total)}
+    return {"type": "open", "question": f"What is {a} + {b}?", "answer": str(total)}
+
+
+def make_malformed(question, rng=random):
+    broken = dict(question)
+    kind = rng.choice(["missing_answer", "answer_type", "options"])
+    if kind == "missing_answer":
+        broken.pop("answer", None)
+    elif kind == "answer_type":
+        broken["answer"] = 42
+    else:
+        broken["type"] = "multiple"
+        broken["options"] = "not a list"
+    return broken
+
+
+def load_questions(path):
+    with open(path) as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        return data
+    bank = {}
+    for item in data:
+        bank.setdefault(item.get("difficulty", "easy"), []).append(item)
+    return bank
+
+
+class QuestionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/generate_question":
+            self.send_json(404, {"error": "not found"})
+            return
+        params = parse_qs(url.query)
+        difficulty = params.get("difficulty", ["easy"])[0]
+        delay = self.sample_latency()
+        if delay:
+            time.sleep(delay)
+        if self.server.rng.random() < self.server.error_rate:
+            self.send_json(503, {"error": "injected failure"})
+            return
+
+        if "count" in params and self.server.batch:
+            try:
+                count = max(1, min(int(params["count"][0]), 100))
+            except ValueError:
+                self.send_json(400, {"error": "count must be an integer"})
+                return
+            if params.get("stream", ["0"])[0] == "1" and self.server.stream:
+                self.send_stream(difficulty, count)
+            else:
+                self.send_json(200, [self.generate(difficulty) for _ in range(count)])
+        else:
+            self.send_json(200, self.generate(difficulty))
+
+    def sample_latency(self):
+        server = self.server
+        if server.latency_dist == "uniform":
+            return server.latency + server.rng.uniform(0, server.jitter)
+        if server.latency_dist == "exponential" and server.jitter:
+            return server.latency + server.rng.expovariate(1 / server.jitter)
+        return server.latency
+
+    def generate(self, difficulty):
+        server = self.server
+        if server.generate_time:
+            time.sleep(server.generate_time)
+        pool = server.questions.get(difficulty) if server.questions else None
+        question = dict(server.rng.choice(pool)) if pool else make_question(difficulty, server.rng)
+        if server.rng.random() < server.malformed_rate:
+            question = make_malformed(question, server.rng)
+        return question
+
+    def send_stream(self, difficulty, count):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for _ in range(count):
+            line = json.dumps(self.generate(difficulty)).encode() + b"\n"
+            self.wfile.write(b"%x\r\n" % len(line))
+            self.write_body(line)
+            self.wfile.write(b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        if status == 200 and self.server.rng.random() < self.server.malformed_rate:
+            # Truncated body: valid HTTP, broken JSON
+            body = body[:len(body) // 2]
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.write_body(body)
+
+    # Slow-drip mode sends the body a few bytes at a time
+    def write_body(self, body):
+        step = self.server.drip_bytes
+        if not step:
+            self.wfile.write(body)
+            return
+        for start in range(0, len(body), step):
+            self.wfile.write(body[start:start + step])
+            self.wfile.flush()
+            time.sleep(self.server.drip_delay)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def start_server(host="127.0.0.1", port=0, batch=True, stream=True, latency=0.0, jitter=0.0, latency_dist="fixed",
+                 generate_time=0.0, error_rate=0.0, malformed_rate=0.0, drip_bytes=0, drip_delay=0.0,
+                 questions=None, seed=None, verbose=False):
+    server = ThreadingHTTPServer((host, port), QuestionHandler)
+    server.daemon_threads = True
+    server.batch = batch
+    server.stream = stream
+    server.latency = latency
+    server.jitter = jitter
+    server.latency_dist = latency_dist
+    server.generate_time = generate_time
+    server.error_rate = error_rate
+    server.malformed_rate = malformed_rate
+    server.drip_bytes = drip_bytes
+    server.drip_delay = drip_delay
+    server.questions = questions
+    server.rng = random.Random(seed)
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, name="mock-server", daemon=True).start()
+    return server
+
+
+def server_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/generate_question"
+
+
+def add_server_arguments(parser):
+    parser.add_argument("--questions", help="JSON question file to serve instead of generated questions")
+    parser.add_argument("--no-batch", action="store_true", help="ignore ?count= like the old server")
+    parser.add_argument("--no-stream", action="store_true", help="answer ?stream=1 with a plain JSON array")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="base delay before each response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="spread of the extra delay")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--generate-ms", type=float, default=0.0, help="time to generate each question")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="fraction of broken bodies and items")
+    parser.add_argument("--drip-bytes", type=int, default=0, help="send bodies this many bytes at a time")
+    parser.add_argument("--drip-ms", type=float, default=0.0, help="pause between slow-drip writes")
+    parser.add_argument("--seed", type=int, help="seed for repeatable runs")
+
+
+def server_options(args):
+    return {
+        "batch": not args.no_batch,
+        "stream": not args.no_stream,
+        "latency": args.latency_ms / 1000,
+        "jitter": args.jitter_ms / 1000,
+        "latency_dist": args.latency_dist,
+        "generate_time": args.generate_ms / 1000,
+        "error_rate": args.error_rate,
+        "malformed_rate": args.malformed_rate,
+        "drip_bytes": args.drip_bytes,
+        "drip_delay": args.drip_ms / 1000,
+        "questions": load_questions(args.questions) if args.questions else None,
+        "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the question API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(args.host, args.port, verbose=True, **server_options(args))
+    print(f"Serving questions on {server_url(server)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# Near-duplicate detection for question text with MinHash and
+# locality-sensitive hashing (LSH), so a new question is compared only
+# with the few stored questions that share an LSH bucket instead of the
+# whole bank.
+#
+# A question is normalized (casefold, punctuation stripped) and cut into
+# character trigrams. Its MinHash signature keeps the smallest trigram hash
+# under each of num_perm hash functions. Two signatures agree in a slot with
+# probability equal to the Jaccard similarity of the trigram sets. Signatures
+# are split into bands of rows. Questions that match in a whole band land in
+# the same bucket and become candidates. Only the candidates' trigram sets
+# are then compared exactly against the threshold.
+#
+# Questions that differ in their numbers ("What is 3 + 4?" and "What is
+# 3 + 5?") are different questions, however close the wording.
+#
+# Report near-duplicates in question files:
+#   python near_dup.py check questions.jsonl questions.csv --threshold 0.8
+import argparse
+import hashlib
+import re
+import struct
+import threading
+
+from live_bank import read_records
+from seen_filter import normalize_text
+
+NEAR_DUP_THRESHOLD = 0.8
+NUM_PERM = 64
+BAND_RECALL = 0.95
+
+
+def trigrams(text):
+    text = f" {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# Fewest rows per band (so the most bands) that still makes a pair at the
+# threshold a candidate with probability band_recall; pairs below it are
+# weeded out by the full signature comparison.
+def choose_bands(threshold, num_perm, band_recall=BAND_RECALL):
+    best = 1
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= band_recall:
+            best = rows
+    return num_perm // best, best
+
+
+# A reference index (e.g. the authored question bank's) is also checked by
+# check_and_add but never added to, so questions from elsewhere cannot
+# crowd out the ones it holds.
+class NearDuplicateIndex:
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD, num_perm=NUM_PERM, reference=None):
+        if reference is not None and reference.num_perm != num_perm:
+            raise ValueError("reference index must use the same num_perm")
+        self.threshold = threshold
+        self.reference = reference
+        self.num_perm = num_perm
+        self.row = struct.Struct(f"<{num_perm}I")
+        self.bands, self.rows = choose_bands(threshold, num_perm)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    # One SHAKE digest per trigram gives it num_perm independent 32-bit
+    # hashes; the signature is the column-wise minimum
+    def sketch(self, text):
+        normalized = normalize_text(text)
+        grams = trigrams(normalized)
+        size = self.row.size
+        signature = tuple(map(min, zip(*[self.row.unpack(hashlib.shake_128(gram.encode()).digest(size))
+                                          for gram in grams])))
+        # Numbers come from the raw text: normalizing "3+4" would run them together
+        numbers = tuple(re.findall(r"\d+", text))
+        return signature, (normalized, numbers), grams
+
+    def band_keys(self, signature):
+        rows = self.rows
+        return [signature[b * rows:(b + 1) * rows] for b in range(self.bands)]
+
+    # Stored keys at least threshold similar to text, most similar first
+    def find(self, text):
+        signature, entry, grams = self.sketch(text)
+        with self.lock:
+            return self._matches(signature, entry[1], grams)
+
+    def add(self, key, text):
+        self.add_many([(key, text)])
+
+    def add_many(self, items):
+        for key, text in items:
+            signature, entry, _ = self.sketch(text)
+            with self.lock:
+                self._insert(key, signature, entry)
+
+    def remove(self, key):
+        self.remove_many([key])
+
+    def remove_many(self, keys):
+        with self.lock:
+            for key in keys:
+                entry = self.entries.pop(key, None)
+                if entry is None:
+                    continue
+                for bucket, band in zip(self.buckets, self.band_keys(self.sketch(entry[0])[0])):
+                    keys_in_band = bucket[band]
+                    keys_in_band.remove(key)
+                    if not keys_in_band:
+                        del bucket[band]
+
+    # Adds text unless it is a near-duplicate of another stored question, in
+    # which case the stored key it matches is returned. Checking and adding
+    # under one lock keeps two threads from both adding the same rewording.
+    def check_and_add(self, key, text):
+        signature, entry, grams = self.sketch(text)
+        if self.reference is not None:
+            with self.reference.lock:
+                matches = self.reference._matches(signature, entry[1], grams)
+            if matches:
+                return matches[0][0]
+        with self.lock:
+            if key in self.entries:
+                return None
+            matches = self._matches(signature, entry[1], grams)
+            if matches:
+                return matches[0][0]
+            self._insert(key, signature, entry)
+            return None
+
+    def _matches(self, signature, numbers, grams):
+        candidates = set()
+        for bucket, band in zip(self.buckets, self.band_keys(signature)):
+            candidates.update(bucket.get(band, ()))
+        matches = []
+        for key in candidates:
+            other, other_numbers = self.entries[key]
+            if other_numbers != numbers:
+                continue
+            other_grams = trigrams(other)
+            similarity = len(grams & other_grams) / (len(grams | other_grams) or 1)
+            if similarity >= self.threshold:
+                matches.append((key, similarity))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
+
+    # Only the normalized text is kept per question; the signature is
+    # recomputed on removal, which is rare
+    def _insert(self, key, signature, entry):
+        if key in self.entries:
+            return
+        self.entries[key] = entry
+        for bucket, band in zip(self.buckets, self.band_keys(signature)):
+            bucket.setdefault(band, []).append(key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate question tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    check = commands.add_parser("check", help="list questions that are near-duplicates of an earlier one")
+    check.add_argument("sources", nargs="+")
+    check.add_argument("--threshold", type=float, default=NEAR_DUP_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.command == "check":
+        index = NearDuplicateIndex(args.threshold)
+        texts = []
+        found = 0
+        for path in args.sources:
+            _, lines, parse = read_records(path)
+            for line in lines:
+                try:
+                    text = parse(line).get("question")
+                except (ValueError, AttributeError):
+                    continue
+                if not isinstance(text, str):
+                    continue
+                match = index.check_and_add(len(texts), text)
+                texts.append(text)
+                if match is not None:
+                    found += 1
+                    print(f"{path}: {text!r} ~ {texts[match]!r}")
+        print(f"{found} near-duplicates in {len(texts)} questions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import queue
+import threading
+
+from question_api import api_failing, fetch_questions
+
+PREFETCH_WORKERS = 2
+PREFETCH_MAX_BUFFERED = 30
+
+
+# Fetches questions on background threads into one queue per difficulty.
+# The UI never waits on the network: it polls take() from root.after.
+# Questions that are not used stay buffered for later rounds, up to
+# max_buffered questions (ready or in flight) across all difficulties.
+# Questions are not checked against anyone's seen set here: they may be
+# played by whoever comes next, so the UI filters them as it takes them.
+class QuestionPrefetcher:
+    def __init__(self, difficulties, session=None, cache=None, offline_first=False, workers=PREFETCH_WORKERS,
+                 max_buffered=PREFETCH_MAX_BUFFERED, near_dups=None):
+        self.max_buffered = max_buffered
+        self.session = session
+        self.cache = cache
+        self.offline_first = offline_first
+        self.near_dups = near_dups
+        self.failed = {level: False for level in difficulties}
+        self.ready = {level: queue.Queue() for level in difficulties}
+        self.pending = {level: 0 for level in difficulties}
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"prefetch-{i}", daemon=True).start()
+
+    def fill(self, difficulty, target):
+        with self.lock:
+            missing = target - self.ready[difficulty].qsize() - self.pending[difficulty]
+            missing = min(missing, self.max_buffered - self._buffered())
+            if missing <= 0:
+                return
+            self.pending[difficulty] += missing
+        self.jobs.put((difficulty, missing))
+
+    def take(self, difficulty, count):
+        taken = []
+        while len(taken) < count:
+            try:
+                taken.append(self.ready[difficulty].get_nowait())
+            except queue.Empty:
+                break
+        return taken
+
+    def busy(self, difficulty):
+        with self.lock:
+            return self.pending[difficulty] > 0
+
+    # Whether the last fetch for difficulty came up short because the API failed
+    def api_failed(self, difficulty):
+        with self.lock:
+            return self.failed[difficulty]
+
+    def _buffered(self):
+        return sum(q.qsize() for q in self.ready.values()) + sum(self.pending.values())
+
+    def _work(self):
+        while True:
+            difficulty, count = self.jobs.get()
+            delivered = 0
+            failed = False
+            try:
+                for question in fetch_questions(difficulty, count, self.session, self.cache, self.offline_first,
+                                                near_dups=self.near_dups):
+                    if delivered == count:
+                        break
+                    with self.lock:
+                        self.ready[difficulty].put(question)
+                        self.pending[difficulty] -= 1
+                    delivered += 1
+            except Exception as e:
+                print(f"Exception while calling API: {e}")
+                failed = True
+            finally:
+                with self.lock:
+                    self.pending[difficulty] -= count - delivered
+                    self.failed[difficulty] = delivered < count and (failed or api_failing())
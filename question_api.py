@@ -0,0 +1,319 @@
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from question_cache import question_hash
+from question_schema import filter_valid, validate_question
+from seen_filter import normalize_text
+
+API_URL = "http://0.0.0.0:8000/generate_question"  # Change if needed
+CONNECT_TIMEOUT = 2
+REQUEST_TIMEOUT = 5
+POOL_MAXSIZE = 4
+RETRY_TOTAL = 2
+RETRY_BACKOFF = 0.2
+RETRY_JITTER = 0.1
+BATCH_UNSUPPORTED_STATUSES = (400, 404, 405, 422, 501)
+STREAM_QUESTIONS = True
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+DEDUP_ATTEMPTS = 3
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RESET_TIMEOUT = 30
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# None until the server has answered a batch request, then True or False
+batch_supported = None
+
+
+# One long-lived session keeps connections to the API alive between
+# questions and rounds instead of paying for a new TCP connection each time.
+def create_session():
+    retry = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        backoff_jitter=RETRY_JITTER,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods={"GET"},
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+# Stops calling a dead API for a cool-down window after repeated failures.
+# While open, requests fail immediately so the game falls back to local
+# questions in milliseconds; a background probe closes it again once the
+# server answers.
+class CircuitBreaker:
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT, probe=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.short_circuits = 0
+        self.transitions = {}
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._move_to(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            self.short_circuits += 1
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.probing = False
+            if self.state != CLOSED:
+                self._move_to(CLOSED)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self._move_to(OPEN)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "short_circuits": self.short_circuits,
+                "transitions": dict(self.transitions),
+            }
+
+    def _move_to(self, state):
+        key = f"{self.state}->{state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        print(f"API circuit breaker: {key}")
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            if self.probe:
+                timer = threading.Timer(self.reset_timeout, self._run_probe)
+                timer.daemon = True
+                timer.start()
+
+    def _run_probe(self):
+        if not self.allow_request():
+            return
+        try:
+            healthy = self.probe()
+        except Exception as e:
+            print(f"API probe failed: {e}")
+            healthy = False
+        if healthy:
+            self.record_success()
+        else:
+            self.record_failure()
+
+
+def probe_api():
+    response = requests.get(API_URL, params={"difficulty": "easy"}, timeout=(CONNECT_TIMEOUT, REQUEST_TIMEOUT))
+    return response.status_code < 500
+
+
+breaker = CircuitBreaker(probe=probe_api)
+
+
+# True while the API is short-circuited or its last request failed
+def api_failing():
+    stats = breaker.stats()
+    return stats["state"] != CLOSED or stats["failures"] > 0
+
+
+def get_questions(difficulty, session=None, count=None, stream=False):
+    if not breaker.allow_request():
+        raise CircuitOpenError("Question API is unavailable, skipping request.")
+    http = session or requests
+    params = {"difficulty": difficulty}
+    if count is not None:
+        params["count"] = count
+    if stream:
+        params["stream"] = 1
+    try:
+        response = http.get(API_URL, params=params, timeout=(CONNECT_TIMEOUT, REQUEST_TIMEOUT), stream=stream)
+    except Exception:
+        breaker.record_failure()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+def fetch_question(difficulty, session=None):
+    response = get_questions(difficulty, session)
+    if response.status_code != 200:
+        print(f"API error: {response.status_code}")
+        return None
+    data = response.json()
+    # Validate the structure
+    if validate_question(data):
+        return data
+    return None
+
+
+# Asks for a whole round in one round trip. A streaming server answers
+# with newline-delimited JSON and each question is yielded as soon as its
+# line arrives; otherwise the whole JSON array is validated in one pass.
+# An old server that ignores count marks batching as unsupported.
+def fetch_round(difficulty, num, session=None):
+    global batch_supported
+    with get_questions(difficulty, session, count=num, stream=STREAM_QUESTIONS) as response:
+        if response.status_code in BATCH_UNSUPPORTED_STATUSES:
+            batch_supported = False
+            return
+        if response.status_code != 200:
+            print(f"API error: {response.status_code}")
+            return
+
+        if response.headers.get("Content-Type", "").startswith(NDJSON_CONTENT_TYPE):
+            batch_supported = True
+            delivered = 0
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    # A garbled line is skipped like an invalid question
+                    continue
+                if validate_question(data):
+                    yield data
+                    delivered += 1
+                    if delivered == num:
+                        return
+            return
+
+        data = response.json()
+        if isinstance(data, dict):
+            # An old server ignores count and sends back a single question
+            batch_supported = False
+            if validate_question(data):
+                yield data
+            return
+        batch_supported = True
+        yield from filter_valid(data[:num])
+
+
+# Yields questions as they become available so callers can use the
+# first one before the rest of the round has arrived. A failed question
+# is skipped without losing the ones already fetched.
+def fetch_from_api(difficulty, num=5, session=None):
+    remaining = num
+    if batch_supported is not False and num > 1:
+        try:
+            for question in fetch_round(difficulty, num, session):
+                remaining -= 1
+                yield question
+        except Exception as e:
+            print(f"Exception while calling API: {e}")
+            return
+        if batch_supported is not False:
+            return
+
+    for _ in range(remaining):
+        try:
+            data = fetch_question(difficulty, session)
+        except CircuitOpenError as e:
+            print(e)
+            return
+        except Exception as e:
+            print(f"Exception while calling API: {e}")
+            continue
+        if data is not None:
+            yield data
+
+
+# Drops API questions that only reword one already in the index (cached,
+# authored or fetched earlier), before they reach the cache or a round.
+def drop_near_duplicates(questions, near_dups=None):
+    for question in questions:
+        if near_dups is None or near_dups.check_and_add(question_hash(question), question["question"]) is None:
+            yield question
+
+
+def top_up_cache(cache, difficulty, num, session=None, near_dups=None):
+    cache.put_many(difficulty, list(drop_near_duplicates(fetch_from_api(difficulty, num, session), near_dups)))
+
+
+# With a bank, the round is drawn from the local question bank, narrowed by
+# filters such as {"type": "multiple", "category": "networking"}.
+# With a cache, every question from the API is stored and questions the API
+# could not provide are made up from the cache. In offline-first mode the
+# round is served from the cache straight away and the cache is topped up
+# from the API in the background.
+def fetch_from_sources(difficulty, num=5, session=None, cache=None, offline_first=False, bank=None, filters=None,
+                       near_dups=None):
+    if bank is not None:
+        yield from bank.sample_where(num, difficulty=difficulty, **(filters or {}))
+        return
+
+    if cache is None:
+        yield from drop_near_duplicates(fetch_from_api(difficulty, num, session), near_dups)
+        return
+
+    served = []
+    if offline_first:
+        served = cache.sample(difficulty, num)
+        yield from served
+        if len(served) == num:
+            threading.Thread(target=top_up_cache, args=(cache, difficulty, num, session, near_dups), daemon=True).start()
+            return
+
+    for question in drop_near_duplicates(fetch_from_api(difficulty, num - len(served), session), near_dups):
+        cache.put(difficulty, question)
+        served.append(question)
+        yield question
+
+    if len(served) < num:
+        yield from cache.sample(difficulty, num - len(served), exclude=[question_hash(q) for q in served])
+
+
+# Questions the player has already seen (or that repeat within this fetch)
+# are dropped and replaced by fetching again, up to DEDUP_ATTEMPTS times.
+def fetch_questions(difficulty, num=5, session=None, cache=None, offline_first=False, seen=None, bank=None,
+                    filters=None, near_dups=None):
+    if seen is None:
+        yield from fetch_from_sources(difficulty, num, session, cache, offline_first, bank, filters, near_dups)
+        return
+
+    fetched = set()
+    delivered = 0
+    for _ in range(DEDUP_ATTEMPTS):
+        for question in fetch_from_sources(difficulty, num - delivered, session, cache, offline_first, bank, filters,
+                                           near_dups):
+            key = normalize_text(question["question"])
+            if key in fetched or question in seen:
+                continue
+            fetched.add(key)
+            delivered += 1
+            yield question
+        if delivered >= num:
+            return
@@ -0,0 +1,273 @@
+# Compact on-disk question bank that is opened with mmap, so a bank with
+# millions of questions costs almost nothing at startup. Only the records
+# that are actually sampled get decoded.
+#
+# Layout (all integers little-endian):
+#   header   magic "QBNK", version u16, table count u32, record count u64,
+#            offsets position u64, tables position u64
+#   records  u32 length + compact JSON, one per question
+#   offsets  u64 file position of every record, indexed by record id
+#   tables   per table: u16 key length, key ("difficulty=easy", "type=open",
+#            "category=networking", "tag=dns"), u32 id count, u64 ids position;
+#            each ids block is a sorted u32 array
+#
+# The tables are an inverted index over question attributes: filtered
+# sampling intersects them without building the intersection.
+#
+# Build a bank from JSON or CSV files:
+#   python question_bank.py build questions.json more.csv -o questions.qbank
+import argparse
+import bisect
+import csv
+import json
+import mmap
+import random
+import struct
+import sys
+from array import array
+
+from question_schema import validate_question
+
+BANK_MAGIC = b"QBNK"
+BANK_VERSION = 2
+HEADER = struct.Struct("<4sHIQQQ")
+RECORD_LENGTH = struct.Struct("<I")
+OFFSET = struct.Struct("<Q")
+RECORD_ID = struct.Struct("<I")
+TABLE_ENTRY = struct.Struct("<IQ")
+OPTION_SEPARATOR = "|"
+INDEXED_FIELDS = ("difficulty", "type", "category")
+REJECTION_BUDGET = 32
+
+
+def table_key(field, value):
+    return f"{field}={value}"
+
+
+def index_keys(question):
+    keys = [table_key(field, question[field]) for field in INDEXED_FIELDS if question.get(field)]
+    keys.extend(table_key("tag", tag) for tag in question.get("tags", []))
+    return keys
+
+
+def contains(ids, record_id):
+    i = bisect.bisect_left(ids, record_id)
+    return i < len(ids) and ids[i] == record_id
+
+
+def filter_items(filters):
+    for field, values in filters.items():
+        for value in values if isinstance(values, (list, tuple)) else [values]:
+            yield field, value
+
+
+# Draws from the shortest sorted id list and keeps a draw only if the other
+# lists contain it (binary search), so the intersection is never built
+# unless it turns out to be too sparse for rejection sampling.
+def sample_intersection(postings, k, rng=random):
+    postings = sorted(postings, key=len)
+    smallest, others = postings[0], postings[1:]
+    k = min(k, len(smallest))
+    if not k:
+        return []
+
+    chosen = {}
+    for _ in range(REJECTION_BUDGET * k):
+        if len(chosen) == k:
+            break
+        record_id = smallest[rng.randrange(len(smallest))]
+        if record_id not in chosen and all(contains(ids, record_id) for ids in others):
+            chosen[record_id] = None
+    if len(chosen) == k:
+        return list(chosen)
+    matches = [record_id for record_id in smallest if all(contains(ids, record_id) for ids in others)]
+    return rng.sample(matches, min(k, len(matches)))
+
+
+def pad_to(file, alignment):
+    padding = -file.tell() % alignment
+    if padding:
+        file.write(b"\0" * padding)
+
+
+def write_array(file, values):
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    values.tofile(file)
+
+
+def build_bank(questions, path):
+    offsets = array("Q")
+    tables = {}
+    skipped = 0
+    with open(path, "wb") as file:
+        file.write(b"\0" * HEADER.size)
+        for question in questions:
+            if not validate_question(question):
+                skipped += 1
+                continue
+            record_id = len(offsets)
+            question.setdefault("difficulty", "easy")
+            for key in index_keys(question):
+                tables.setdefault(key, array("I")).append(record_id)
+            payload = json.dumps(question, separators=(",", ":")).encode()
+            offsets.append(file.tell())
+            file.write(RECORD_LENGTH.pack(len(payload)))
+            file.write(payload)
+
+        pad_to(file, 8)
+        offsets_pos = file.tell()
+        write_array(file, offsets)
+
+        ids_positions = {}
+        for key, ids in tables.items():
+            pad_to(file, 8)
+            ids_positions[key] = file.tell()
+            write_array(file, ids)
+
+        tables_pos = file.tell()
+        for key, ids in tables.items():
+            encoded = key.encode()
+            file.write(struct.pack("<H", len(encoded)) + encoded)
+            file.write(TABLE_ENTRY.pack(len(ids), ids_positions[key]))
+
+        file.seek(0)
+        file.write(HEADER.pack(BANK_MAGIC, BANK_VERSION, len(tables), len(offsets), offsets_pos, tables_pos))
+    return len(offsets), skipped
+
+
+class QuestionBank:
+    # A built bank never changes while it is open
+    generation = 0
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, num_tables, self.num_records, self.offsets_pos, tables_pos = HEADER.unpack_from(self.mm, 0)
+        if magic != BANK_MAGIC or version != BANK_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {BANK_VERSION} question bank.")
+
+        self.tables = {}
+        pos = tables_pos
+        for _ in range(num_tables):
+            (key_length,) = struct.unpack_from("<H", self.mm, pos)
+            key = self.mm[pos + 2:pos + 2 + key_length].decode()
+            pos += 2 + key_length
+            self.tables[key] = TABLE_ENTRY.unpack_from(self.mm, pos)
+            pos += TABLE_ENTRY.size
+
+    def __len__(self):
+        return self.num_records
+
+    def current(self):
+        return self
+
+    def count(self, field, value):
+        return self.tables.get(table_key(field, value), (0, 0))[0]
+
+    # Sorted record ids with this attribute, read straight from the mapping
+    def ids(self, field, value):
+        count, ids_pos = self.tables.get(table_key(field, value), (0, 0))
+        if not count:
+            return ()
+        view = memoryview(self.mm)[ids_pos:ids_pos + count * RECORD_ID.size].cast("I")
+        if sys.byteorder != "little":
+            view = array("I", view)
+            view.byteswap()
+        return view
+
+    # Per-record label number for one attribute (0 = unset) and the label names
+    def labels(self, field):
+        names = [key.split("=", 1)[1] for key in self.tables if key.startswith(field + "=")]
+        numbers = array("I", [0]) * self.num_records
+        for number, name in enumerate(names, 1):
+            for record_id in self.ids(field, name):
+                numbers[record_id] = number
+        return numbers, [None] + names
+
+    def get(self, record_id):
+        if not 0 <= record_id < self.num_records:
+            raise IndexError(f"no question {record_id} in {self.path}")
+        (offset,) = OFFSET.unpack_from(self.mm, self.offsets_pos + record_id * OFFSET.size)
+        (length,) = RECORD_LENGTH.unpack_from(self.mm, offset)
+        start = offset + RECORD_LENGTH.size
+        return json.loads(self.mm[start:start + length])
+
+    def sample(self, difficulty, k, rng=random):
+        return self.sample_where(k, rng, difficulty=difficulty)
+
+    # Uniform sample of k questions matching every filter, e.g.
+    # sample_where(5, difficulty="hard", type="multiple", category="networking")
+    def sample_where(self, k, rng=random, **filters):
+        postings = [self.ids(field, value) for field, value in filter_items(filters)]
+        ids = sample_intersection(postings or [range(self.num_records)], k, rng)
+        return [self.get(record_id) for record_id in ids]
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+
+def read_json_questions(path):
+    with open(path) as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        for difficulty, items in data.items():
+            for item in items:
+                yield dict(item, difficulty=difficulty)
+    else:
+        yield from data
+
+
+# CSV columns: difficulty, type, question, answer, options, category, tags,
+# aliases (options, tags and aliases separated by "|")
+def read_csv_questions(path):
+    with open(path, newline="") as file:
+        for row in csv.DictReader(file):
+            yield csv_row_to_question(row)
+
+
+def csv_row_to_question(row):
+    question = {
+        "difficulty": row.get("difficulty") or "easy",
+        "type": row.get("type", ""),
+        "question": row.get("question", ""),
+        "answer": row.get("answer", ""),
+    }
+    if row.get("options"):
+        question["options"] = row["options"].split(OPTION_SEPARATOR)
+    if row.get("category"):
+        question["category"] = row["category"]
+    if row.get("tags"):
+        question["tags"] = row["tags"].split(OPTION_SEPARATOR)
+    if row.get("aliases"):
+        question["aliases"] = row["aliases"].split(OPTION_SEPARATOR)
+    return question
+
+
+def read_questions(paths):
+    for path in paths:
+        if path.lower().endswith(".csv"):
+            yield from read_csv_questions(path)
+        else:
+            yield from read_json_questions(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Question bank tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="convert JSON/CSV question files into a binary bank")
+    build.add_argument("sources", nargs="+")
+    build.add_argument("-o", "--output", default="questions.qbank")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        written, skipped = build_bank(read_questions(args.sources), args.output)
+        print(f"Wrote {written} questions to {args.output} ({skipped} invalid skipped)")
+
+
+if __name__ == "__main__":
+    main()
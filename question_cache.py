@@ -0,0 +1,89 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+CACHE_FILE = "question_cache.db"
+CACHE_TTL = 7 * 24 * 3600
+CACHE_MAX_ITEMS = 5000
+
+
+def question_hash(question):
+    return hashlib.sha256(json.dumps(question, sort_keys=True).encode()).hexdigest()
+
+
+# Keeps every validated API question on disk so later rounds can be served
+# without the network. Entries expire after ttl seconds and the least
+# recently used ones are evicted once the cache holds more than max_items.
+class QuestionCache:
+    def __init__(self, path=CACHE_FILE, ttl=CACHE_TTL, max_items=CACHE_MAX_ITEMS):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS questions ("
+                " hash TEXT PRIMARY KEY,"
+                " difficulty TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS questions_difficulty ON questions (difficulty, created_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS questions_last_used ON questions (last_used)")
+
+    def put_many(self, difficulty, questions):
+        now = time.time()
+        rows = [(question_hash(q), difficulty, json.dumps(q), now, now) for q in questions]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO questions VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(hash) DO UPDATE SET created_at = excluded.created_at",
+                rows,
+            )
+            self._evict(now)
+
+    def put(self, difficulty, question):
+        self.put_many(difficulty, [question])
+
+    def sample(self, difficulty, num, exclude=()):
+        now = time.time()
+        exclude = set(exclude)
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT hash, payload FROM questions WHERE difficulty = ? AND created_at > ?"
+                " ORDER BY RANDOM() LIMIT ?",
+                (difficulty, now - self.ttl, num + len(exclude)),
+            ).fetchall()
+            rows = [row for row in rows if row[0] not in exclude][:num]
+            self.conn.executemany("UPDATE questions SET last_used = ? WHERE hash = ?", [(now, row[0]) for row in rows])
+        return [json.loads(payload) for _, payload in rows]
+
+    # (hash, question text) of every live entry, e.g. to seed a near-duplicate index
+    def texts(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT hash, payload FROM questions WHERE created_at > ?", (time.time() - self.ttl,)
+            ).fetchall()
+        return [(key, json.loads(payload)["question"]) for key, payload in rows]
+
+    def count(self, difficulty=None):
+        with self.lock:
+            if difficulty is None:
+                return self.conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+            return self.conn.execute("SELECT COUNT(*) FROM questions WHERE difficulty = ?", (difficulty,)).fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _evict(self, now):
+        self.conn.execute("DELETE FROM questions WHERE created_at <= ?", (now - self.ttl,))
+        excess = self.conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0] - self.max_items
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM questions WHERE hash IN (SELECT hash FROM questions ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
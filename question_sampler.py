@@ -0,0 +1,200 @@
+# Weighted question sampling in O(1) per draw using Walker/Vose alias tables.
+#
+# Items are split into blocks of about sqrt(n) items, each with its own alias
+# table, plus one alias table over the block totals. A draw picks a block and
+# then an item inside it (two O(1) draws); changing one weight rebuilds only
+# its block and the small top-level table.
+import json
+import math
+import os
+import random
+import threading
+from array import array
+from collections import deque
+
+RECENT_SIZE = 50
+STATS_FILE = "question_stats.json"
+MIN_BLOCK_SIZE = 64
+DRAW_ATTEMPTS = 20
+
+
+class AliasTable:
+    def __init__(self, weights):
+        n = len(weights)
+        self.n = n
+        self.total = math.fsum(weights)
+        self.prob = array("d", [1.0]) * n
+        self.alias = array("I", range(n))
+        if n == 0 or self.total <= 0:
+            return
+
+        scaled = [w * n / self.total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] += scaled[s] - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        # Whatever is left over is 1.0 up to rounding error
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def draw(self, rng=random):
+        i = int(rng.random() * self.n)
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class WeightedSampler:
+    def __init__(self, weights, block_size=None):
+        self.weights = array("d", weights)
+        self.block_size = block_size or max(MIN_BLOCK_SIZE, math.isqrt(len(self.weights)))
+        self.blocks = [self._build_block(start) for start in range(0, len(self.weights), self.block_size)]
+        self.top = AliasTable([block.total for block in self.blocks])
+
+    def __len__(self):
+        return len(self.weights)
+
+    def draw(self, rng=random):
+        b = self.top.draw(rng)
+        return b * self.block_size + self.blocks[b].draw(rng)
+
+    def update(self, index, weight):
+        self.update_many({index: weight})
+
+    # Rebuilds each touched block once, then the top-level table
+    def update_many(self, changes):
+        touched = set()
+        for index, weight in changes.items():
+            self.weights[index] = weight
+            touched.add(index // self.block_size)
+        for b in touched:
+            self.blocks[b] = self._build_block(b * self.block_size)
+        self.top = AliasTable([block.total for block in self.blocks])
+
+    def _build_block(self, start):
+        return AliasTable(self.weights[start:start + self.block_size])
+
+
+# How often each question has been shown and missed, per difficulty, keyed
+# by question_hash so the counts survive restarts and bank reloads. Each
+# entry also keeps the record id it was last seen under, so a sampler finds
+# it with one lookup (and checks the hash) instead of hashing the whole
+# bank. version goes up on every result, so a sampler built from a copy can
+# tell whether it missed any.
+class QuestionStats:
+    def __init__(self, path=STATS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        # Saves share a temp file, so they run one at a time; results can
+        # still be recorded while one is writing
+        self.save_lock = threading.Lock()
+        self.version = 0
+        try:
+            with open(path, "r") as file:
+                self.counts = json.load(file)
+        except FileNotFoundError:
+            self.counts = {}
+        except Exception as e:
+            print(f"Error reading question stats: {e}")
+            self.counts = {}
+
+    # ({key: (shown, missed, record id or None)}, version) for one difficulty
+    def snapshot(self, difficulty):
+        with self.lock:
+            history = {key: (value + [None])[:3] for key, value in self.counts.get(difficulty, {}).items()}
+            return {key: tuple(value) for key, value in history.items()}, self.version
+
+    def record(self, difficulty, key, correct, record_id=None):
+        with self.lock:
+            counts = self.counts.setdefault(difficulty, {}).setdefault(key, [0, 0, None])
+            counts[0] += 1
+            counts[1] += not correct
+            counts[2:] = [record_id]
+            self.version += 1
+
+    def save(self):
+        with self.save_lock:
+            with self.lock:
+                data = json.dumps(self.counts, separators=(",", ":"))
+            try:
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w") as file:
+                    file.write(data)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print(f"Error saving question stats: {e}")
+
+
+# Picks questions weighted by freshness (rarely shown first), historical miss
+# rate (often missed first) and category balance (every category gets the
+# same total weight), and never repeats a player's recently drawn questions
+# while there is anything else to draw. counts gives earlier (shown, missed)
+# counts by index.
+class QuestionSampler:
+    def __init__(self, categories, recent_size=RECENT_SIZE, counts=None):
+        self.categories = categories
+        self.shown = array("I", [0]) * len(categories)
+        self.missed = array("I", [0]) * len(categories)
+        self.category_sizes = {}
+        for category in categories:
+            self.category_sizes[category] = self.category_sizes.get(category, 0) + 1
+        # A question with no history weighs just its category share
+        balance = {category: 1.0 / size for category, size in self.category_sizes.items()}
+        weights = [balance[category] for category in categories]
+        for index, (shown, missed) in (counts or {}).items():
+            self.shown[index] = shown
+            self.missed[index] = missed
+            weights[index] = self.weight(index)
+        self.sampler = WeightedSampler(weights)
+        self.recent_size = recent_size
+        self.recent = {}
+
+    def __len__(self):
+        return len(self.categories)
+
+    def weight(self, index):
+        shown = self.shown[index]
+        freshness = 1.0 / (1 + shown)
+        miss_rate = (self.missed[index] + 1) / (shown + 2)
+        balance = 1.0 / self.category_sizes[self.categories[index]]
+        return freshness * (0.5 + miss_rate) * balance
+
+    def sample(self, k, player=None, rng=random):
+        k = min(k, len(self))
+        recent, recent_set = self.recent.setdefault(player, (deque(maxlen=self.recent_size), set()))
+        chosen = []
+        for allow_recent in (False, True):
+            for _ in range(DRAW_ATTEMPTS * k):
+                if len(chosen) == k:
+                    break
+                index = self.sampler.draw(rng)
+                if index in chosen or (index in recent_set and not allow_recent):
+                    continue
+                chosen.append(index)
+        for index in chosen:
+            if index in recent_set:
+                continue
+            if len(recent) == recent.maxlen:
+                recent_set.discard(recent[0])
+            recent.append(index)
+            recent_set.add(index)
+        return chosen
+
+    # Replaces the (shown, missed) counts of the given indexes
+    def set_counts(self, counts):
+        for index, (shown, missed) in counts.items():
+            self.shown[index] = shown
+            self.missed[index] = missed
+        self.sampler.update_many({index: self.weight(index) for index in counts})
+
+    def record_result(self, index, correct):
+        self.shown[index] += 1
+        if not correct:
+            self.missed[index] += 1
+        self.sampler.update(index, self.weight(index))
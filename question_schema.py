@@ -0,0 +1,73 @@
+# Declarative description of a valid question per type. compile_validator
+# turns it into one small closure per type up front, so checking an item is
+# a dict lookup plus a handful of type checks.
+QUESTION_SCHEMA = {
+    "multiple": {
+        "fields": {"question": str, "answer": str, "options": list},
+        "min_options": 2,
+        "answer_in_options": True,
+    },
+    "truefalse": {
+        "fields": {"question": str, "answer": str},
+        "answers": ("true", "false"),
+    },
+    "open": {
+        "fields": {"question": str, "answer": str},
+        # Other accepted answers, e.g. ["DNS"] for "Domain Name System"
+        "string_lists": ("aliases",),
+    },
+}
+
+
+def compile_type_check(rules):
+    fields = tuple(rules["fields"].items())
+    min_options = rules.get("min_options")
+    answer_in_options = rules.get("answer_in_options", False)
+    answers = frozenset(rules.get("answers", ()))
+    string_lists = rules.get("string_lists", ())
+
+    def check(item):
+        for key, expected in fields:
+            value = item.get(key)
+            if type(value) is not expected or not value:
+                return False
+        if min_options is not None:
+            options = item["options"]
+            if len(options) < min_options:
+                return False
+            for option in options:
+                if type(option) is not str:
+                    return False
+            if answer_in_options and item["answer"] not in options:
+                return False
+        if answers and item["answer"].lower() not in answers:
+            return False
+        for key in string_lists:
+            values = item.get(key, [])
+            if type(values) is not list:
+                return False
+            for value in values:
+                if type(value) is not str:
+                    return False
+        return True
+
+    return check
+
+
+def compile_validator(schema=QUESTION_SCHEMA):
+    checks = {kind: compile_type_check(rules) for kind, rules in schema.items()}
+
+    def validate(item):
+        if type(item) is not dict:
+            return False
+        check = checks.get(item.get("type"))
+        return check is not None and check(item)
+
+    return validate
+
+
+validate_question = compile_validator()
+
+
+def filter_valid(items):
+    return [item for item in items if validate_question(item)]
@@ -1,9 +1,24 @@
 import tkinter as tk
 from tkinter import messagebox
+import math
+import os
 import random
 import threading
 import time
-import requests
+from bisect import bisect_left
+
+from answer_grader import AnswerGrader, difficulty_points
+from prefetch import QuestionPrefetcher
+from question_api import create_session, fetch_questions
+from leaderboard import LeaderboardWriter
+from leaderboard_store import open_leaderboard
+from live_bank import LiveQuestionBank
+from near_dup import NearDuplicateIndex
+from question_bank import QuestionBank
+from question_cache import QuestionCache, question_hash
+from question_sampler import QuestionSampler, QuestionStats
+from quiz_session import FINISHED, QUESTIONS_PER_ROUND, WAITING, QuizSession
+from seen_filter import SeenQuestions
 
 # Fallback local questions
 local_questions = {
@@ -21,10 +36,17 @@ local_questions = {
     ]
 }
 
-difficulty_points = {"easy": 10, "medium": 20, "hard": 30}
-LEADERBOARD_FILE = "leaderboard.txt"
-TIME_LIMIT = 15
-API_URL = "http://0.0.0.0:8000/generate_question"  # Change if needed
+QUESTION_BANK_FILE = "questions.qbank"
+QUESTION_BANK_SOURCES = ["questions.json", "questions.jsonl", "questions.csv"]
+QUESTION_BANK_SNAPSHOT = "questions.snapshot"
+PREFETCH_POLL_MS = 100
+OFFLINE_FIRST = True
+SPARE_ROUNDS = 1
+PREFETCH_OTHER_DIFFICULTIES = False
+NEAR_DUP_THRESHOLD = 0.8
+LEADERBOARD_WRITE_SECONDS = 1.0
+# Times a round asks for replacements for questions the player has seen
+PREFETCH_REFILLS = 3
 
 class QuizApp:
     def __init__(self, root):
@@ -32,28 +54,61 @@ class QuizApp:
         self.root.title("🧠 Quiz Game")
         self.root.geometry("500x400")
         self.root.resizable(False, False)
-        self.player_name = ""
-        self.difficulty = "easy"
-        self.score = 0
-        self.correct = 0
-        self.q_index = 0
-        self.questions = []
-        self.timer = TIME_LIMIT
+        # The round itself is a QuizSession; the app only shows it
+        self.quiz = None
+        self.seen = None
+        self.refills = 0
         self.timer_id = None
-
+        self.poll_id = None
+        self.round_started = 0.0
+        self.api_warned = False
+        self.session = create_session()
+        self.grader = AnswerGrader()
+        # Authored questions are only compared with each other; API questions
+        # are compared with those and with the cache
+        self.bank_near_dups = NearDuplicateIndex(NEAR_DUP_THRESHOLD)
+        self.near_dups = NearDuplicateIndex(NEAR_DUP_THRESHOLD, reference=self.bank_near_dups)
+        self.bank = self.open_bank()
+        # Samplers are built on background threads; shown/missed counts live
+        # in self.stats, which outlasts any one sampler
+        self.stats = QuestionStats()
+        self.samplers = {}
+        self.sampler_builds = {}
+        self.sampler_lock = threading.Lock()
+        self.round_entry = None
+        self.sample_ids = None
+        self.cache = QuestionCache()
+        # Results are written behind the UI; quit() writes out what is left
+        self.leaderboard = LeaderboardWriter(open_leaderboard(), LEADERBOARD_WRITE_SECONDS).start()
+        self.root.protocol("WM_DELETE_WINDOW", self.quit)
+        # Cached questions are what new API questions get compared with
+        threading.Thread(target=lambda: self.near_dups.add_many(self.cache.texts()), daemon=True).start()
+        self.prefetcher = QuestionPrefetcher(difficulty_points, self.session, self.cache, OFFLINE_FIRST,
+                                             near_dups=self.near_dups)
+
+        for level in difficulty_points:
+            self.start_sampler_build(level)
         self.setup_start_screen()
 
-    def name_exists(self, name):
+    # A built .qbank file is used as is; otherwise editable source files are
+    # loaded in the background (from the snapshot when it is up to date) and
+    # reloaded whenever they change.
+    def open_bank(self):
         try:
-            with open(LEADERBOARD_FILE, "r") as file:
-                for line in file:
-                    if line.split(",")[0].strip().lower() == name.lower():
-                        return True
+            return QuestionBank(QUESTION_BANK_FILE)
         except FileNotFoundError:
             pass
-        return False
+        except Exception as e:
+            print(f"Error opening question bank: {e}")
+        if any(os.path.exists(path) for path in QUESTION_BANK_SOURCES):
+            return LiveQuestionBank(QUESTION_BANK_SOURCES, snapshot_path=QUESTION_BANK_SNAPSHOT,
+                                    near_dups=self.bank_near_dups).start()
+        return None
 
     def setup_start_screen(self):
+        if self.poll_id:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
         for widget in self.root.winfo_children():
             widget.destroy()
 
@@ -66,67 +121,263 @@ class QuizApp:
         tk.Label(self.root, text="Select difficulty:").pack(pady=10)
         self.diff_var = tk.StringVar(value="easy")
         for level in ["easy", "medium", "hard"]:
-            tk.Radiobutton(self.root, text=level.title(), variable=self.diff_var, value=level).pack()
+            tk.Radiobutton(self.root, text=level.title(), variable=self.diff_var, value=level,
+                           command=self.prefetch_selected).pack()
+
+        # Filtered rounds are drawn from the local question bank
+        self.type_var = tk.StringVar(value="any")
+        self.category_entry = None
+        if self.bank:
+            row = tk.Frame(self.root)
+            row.pack(pady=5)
+            tk.Label(row, text="Type:").pack(side="left")
+            tk.OptionMenu(row, self.type_var, "any", "multiple", "truefalse", "open").pack(side="left")
+            tk.Label(row, text="Category:").pack(side="left")
+            self.category_entry = tk.Entry(row, width=12)
+            self.category_entry.pack(side="left")
 
         tk.Button(self.root, text="Start Quiz", command=self.start_quiz).pack(pady=20)
+        self.prefetch_selected()
+
+    def prefetch_selected(self):
+        self.prefetcher.fill(self.diff_var.get(), QUESTIONS_PER_ROUND)
+
+    def round_filters(self):
+        filters = {}
+        if self.type_var.get() != "any":
+            filters["type"] = self.type_var.get()
+        if self.category_entry and self.category_entry.get().strip():
+            filters["category"] = self.category_entry.get().strip()
+        return filters
+
+    def show_name_taken(self, name):
+        messagebox.showerror("Name Taken", f"The name '{name}' already exists.\nPlease choose a different name.")
 
     def start_quiz(self):
         name = self.name_entry.get().strip()
         if not name:
             messagebox.showerror("Error", "Please enter your name.")
             return
-        if self.name_exists(name):
-            messagebox.showerror("Name Taken", f"The name '{name}' already exists.\nPlease choose a different name.")
+        if self.leaderboard.name_exists(name):
+            self.show_name_taken(name)
+            return
+        seen = SeenQuestions(name)
+        filters = self.round_filters()
+        questions = []
+        if filters:
+            questions = list(fetch_questions(self.diff_var.get(), QUESTIONS_PER_ROUND, seen=seen, bank=self.bank, filters=filters))
+            if not questions:
+                messagebox.showinfo("No Questions", "No questions match the selected type and category.")
+                return
+        # Claimed as the round starts, so another game sharing the leaderboard cannot take it meanwhile
+        if not self.leaderboard.claim_name(name):
+            self.show_name_taken(name)
             return
-        self.player_name = name
-        self.difficulty = self.diff_var.get()
-        self.score = 0
-        self.correct = 0
-        self.q_index = 0
-        self.questions = self.fetch_questions(self.difficulty, num=5)
-        self.next_question()
 
-    def fetch_questions(self, difficulty, num=5):
-        question_list = []
-        try:
-            for _ in range(num):
-                response = requests.get(API_URL, params={"difficulty": difficulty}, timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    # Validate the structure
-                    if "question" in data and "answer" in data and "type" in data:
-                        if data["type"] == "multiple" and "options" not in data:
-                            raise ValueError("Missing options for multiple-choice question.")
-                        question_list.append(data)
-                else:
-                    print(f"API error: {response.status_code}")
-        except Exception as e:
-            print(f"Exception while calling API: {e}")
-            messagebox.showwarning("API Error", "Could not fetch questions from the server.\nUsing local questions instead.")
+        self.seen = seen
+        self.refills = 0
+        self.quiz = QuizSession(name, self.diff_var.get(), grader=self.grader)
+        self.sample_ids = None
+        self.round_started = time.perf_counter()
+        if filters:
+            # Bank rounds are local and fast enough to draw right away
+            for q in questions:
+                self.seen.add(q)
+            self.quiz.start(questions)
+            self.next_question()
+        else:
+            self.quiz.start(loading=True)
+            self.prefetcher.fill(self.quiz.difficulty, self.quiz.round_size)
+            # Shows the loading screen; the poll replaces it before Tk gets to draw it if questions are ready
+            self.next_question()
+            self.poll_questions()
+
+    def poll_questions(self):
+        self.poll_id = None
+        quiz = self.quiz
+        waiting = quiz.state == WAITING
+        # Check busy before taking so a question delivered in between is not left behind
+        busy = self.prefetcher.busy(quiz.difficulty)
+        fresh = []
+        rejected = 0
+        for q in self.prefetcher.take(quiz.difficulty, quiz.round_size - quiz.total):
+            if q in self.seen:
+                rejected += 1
+                continue
+            self.seen.add(q)
+            fresh.append(q)
+        quiz.add_questions(fresh)
+        if rejected and self.refills < PREFETCH_REFILLS:
+            # Prefetched before we knew who was playing; replace the ones they have seen
+            self.refills += 1
+            self.prefetcher.fill(quiz.difficulty, quiz.round_size - quiz.total)
+            busy = True
+
+        if quiz.total < quiz.round_size and busy:
+            self.poll_id = self.root.after(PREFETCH_POLL_MS, self.poll_questions)
+        else:
+            # Fallback if API failed, or everything it had left was already seen
+            if not quiz.total:
+                # Warn once per outage rather than on every round
+                if self.prefetcher.api_failed(quiz.difficulty) and not self.api_warned:
+                    messagebox.showwarning("API Error", "Could not fetch questions from the server.\nUsing local questions instead.")
+                    self.api_warned = True
+                quiz.add_questions(self.offline_questions())
+            else:
+                self.api_warned = False
+            quiz.done_loading()
+            self.prefetch_spare_rounds()
+
+        if waiting and quiz.state != WAITING:
+            self.next_question()
 
-        # Fallback if API failed
-        if not question_list:
-            question_list = random.sample(local_questions[difficulty], len(local_questions[difficulty]))
-        print(f"api res is {question_list}")
-        return question_list
+    # Offline rounds come from the question bank if there is one, otherwise
+    # from local_questions, drawn by a weighted sampler per difficulty.
+    # Until the difficulty's first sampler is built the round is a plain
+    # uniform sample, so the UI never waits on a build.
+    def offline_questions(self):
+        difficulty = self.quiz.difficulty
+        entry = self.sampler_for(difficulty)
+        if entry is None:
+            self.round_entry = self.sample_ids = None
+            questions = self.bank.sample(difficulty, self.quiz.round_size) if self.bank else []
+            if questions:
+                return questions
+            items = local_questions[difficulty]
+            return random.sample(items, min(self.quiz.round_size, len(items)))
+        sampler, get_question = entry[:2]
+        self.round_entry = entry
+        self.sample_ids = sampler.sample(self.quiz.round_size, self.quiz.player_name)
+        return [get_question(i) for i in self.sample_ids]
+
+    # A sampler from before the last bank reload is used while its
+    # replacement is built; None until the first one is ready
+    def sampler_for(self, difficulty):
+        generation = self.bank.generation if self.bank else 0
+        with self.sampler_lock:
+            entry = self.samplers.get(difficulty)
+        if entry is None or entry[2] != generation:
+            self.start_sampler_build(difficulty)
+        return entry
+
+    def start_sampler_build(self, difficulty):
+        with self.sampler_lock:
+            build = self.sampler_builds.get(difficulty)
+            if build is None or not build.is_alive():
+                build = threading.Thread(target=self.build_sampler, args=(difficulty,), daemon=True)
+                self.sampler_builds[difficulty] = build
+                build.start()
+            return build
+
+    # Entries are (sampler, get_question, generation, ids): sampler index i
+    # is bank record ids[i], or local_questions index i when ids is None
+    def build_sampler(self, difficulty):
+        generation = self.bank.generation if self.bank else 0
+        source = self.bank.current() if self.bank else None
+        if source and source.count("difficulty", difficulty):
+            ids = source.ids("difficulty", difficulty)
+            labels, _ = source.labels("category")
+            categories = [labels[record_id] for record_id in ids]
+            get_question = lambda i, source=source, ids=ids: source.get(ids[i])
+        else:
+            ids = None
+            items = local_questions[difficulty]
+            categories = [item.get("category") for item in items]
+            get_question = lambda i, items=items: items[i]
+        entry = (None, get_question, generation, ids)
+
+        history, version = self.stats.snapshot(difficulty)
+        sampler = QuestionSampler(categories, counts=self.resolve_history(entry, len(categories), history))
+        entry = (sampler,) + entry[1:]
+        # Results recorded meanwhile are only in the stats; catching up is
+        # cheap as it only touches questions with a history
+        while True:
+            with self.sampler_lock:
+                if self.stats.version == version:
+                    self.samplers[difficulty] = entry
+                    return
+            history, version = self.stats.snapshot(difficulty)
+            sampler.set_counts(self.resolve_history(entry, len(categories), history))
+
+    # {sampler index: (shown, missed)} for the history entries whose record
+    # still holds the same question; only those records are decoded
+    def resolve_history(self, entry, size, history):
+        counts = {}
+        for key, (shown, missed, record_id) in history.items():
+            index = self.index_of(entry, size, record_id)
+            if index is not None and question_hash(entry[1](index)) == key:
+                counts[index] = (shown, missed)
+        return counts
+
+    def index_of(self, entry, size, record_id):
+        ids = entry[3]
+        if record_id is None:
+            return None
+        if ids is None:
+            return record_id if record_id < size else None
+        index = bisect_left(ids, record_id)
+        return index if index < len(ids) and ids[index] == record_id else None
+
+    def record_result(self, index, correct):
+        if self.sample_ids is None or index >= len(self.sample_ids):
+            return
+        difficulty = self.quiz.difficulty
+        entry = self.round_entry
+        sample_id = self.sample_ids[index]
+        record_id = sample_id if entry[3] is None else entry[3][sample_id]
+        key = question_hash(self.quiz.questions[index])
+        with self.sampler_lock:
+            self.stats.record(difficulty, key, correct, record_id)
+            entry[0].record_result(sample_id, correct)
+            # A newer sampler built during the round gets the result too
+            current = self.samplers.get(difficulty)
+            if current is not entry and (current[3] is None) == (entry[3] is None):
+                current_index = self.index_of(current, len(current[0]), record_id)
+                if current_index is not None:
+                    current[0].record_result(current_index, correct)
+
+    # Fetch the next round while this one is being played so "Play Again"
+    # can start without waiting on the network.
+    def prefetch_spare_rounds(self):
+        self.prefetcher.fill(self.quiz.difficulty, QUESTIONS_PER_ROUND * SPARE_ROUNDS)
+        if PREFETCH_OTHER_DIFFICULTIES:
+            for level in difficulty_points:
+                if level != self.quiz.difficulty:
+                    self.prefetcher.fill(level, QUESTIONS_PER_ROUND)
+
+    def show_loading(self):
+        for widget in self.root.winfo_children():
+            widget.destroy()
+
+        tk.Label(self.root, text="Loading questions...", font=("Arial", 14)).pack(pady=40)
+        tk.Label(self.root, text=f"Question {self.quiz.q_index + 1} is on its way, {self.quiz.player_name}.").pack()
 
     def next_question(self):
-        if self.q_index >= len(self.questions):
+        if self.quiz.state == WAITING:
+            self.show_loading()
+            return
+        if self.quiz.state == FINISHED:
             self.show_summary()
             return
 
-        self.timer = TIME_LIMIT
-        self.render_question(self.questions[self.q_index])
+        if self.quiz.q_index == 0:
+            print(f"Time to first question: {(time.perf_counter() - self.round_started) * 1000:.0f} ms")
+        q = self.quiz.current_question
+        if q["type"] == "open":
+            # Build the answer key while the player reads, not when they submit
+            self.grader.key_for(q)
+        self.render_question(q)
+        self.quiz.ask()
         self.start_timer()
 
     def render_question(self, q):
         for widget in self.root.winfo_children():
             widget.destroy()
 
-        tk.Label(self.root, text=f"Time left: {self.timer} sec", font=("Arial", 12), fg="red", name="timer").pack(anchor="ne", padx=10, pady=5)
-        tk.Label(self.root, text=f"Score: {self.score}", font=("Arial", 12)).pack(anchor="nw", padx=10)
+        tk.Label(self.root, text=f"Time left: {self.quiz.time_limit} sec", font=("Arial", 12), fg="red", name="timer").pack(anchor="ne", padx=10, pady=5)
+        tk.Label(self.root, text=f"Score: {self.quiz.score}", font=("Arial", 12)).pack(anchor="nw", padx=10)
 
-        tk.Label(self.root, text=f"\nQ{self.q_index + 1}: {q['question']}", font=("Arial", 14)).pack(pady=10)
+        tk.Label(self.root, text=f"\nQ{self.quiz.q_index + 1}: {q['question']}", font=("Arial", 14)).pack(pady=10)
 
         self.answer_var = tk.StringVar()
 
@@ -141,16 +392,19 @@ class QuizApp:
 
         tk.Button(self.root, text="Submit", command=self.submit_answer).pack(pady=20)
 
+    # The countdown is only a display; the deadline lives in the session
     def update_timer(self):
-        self.timer -= 1
-        if self.timer >= 0:
+        remaining = self.quiz.remaining()
+        if remaining > 0:
             timer_label = self.root.nametowidget("timer")
-            timer_label.config(text=f"Time left: {self.timer} sec")
-            self.timer_id = self.root.after(1000, self.update_timer)
+            timer_label.config(text=f"Time left: {math.ceil(remaining)} sec")
+            self.timer_id = self.root.after(min(1000, math.ceil(remaining * 1000)), self.update_timer)
         else:
-            self.root.after_cancel(self.timer_id)
+            self.timer_id = None
             messagebox.showinfo("Time's up!", "You ran out of time!")
-            self.q_index += 1
+            index = self.quiz.q_index
+            self.quiz.timeout()
+            self.record_result(index, False)
             self.next_question()
 
     def start_timer(self):
@@ -159,48 +413,68 @@ class QuizApp:
     def submit_answer(self):
         if self.timer_id:
             self.root.after_cancel(self.timer_id)
+            self.timer_id = None
 
-        user_ans = self.answer_var.get().strip().lower()
-        correct_ans = self.questions[self.q_index]['answer'].lower()
+        q = self.quiz.current_question
+        index = self.quiz.q_index
+        correct = self.quiz.answer(self.answer_var.get())
 
-        if user_ans == correct_ans:
-            self.correct += 1
-            self.score += difficulty_points[self.difficulty]
+        self.record_result(index, correct)
+        if correct:
             messagebox.showinfo("Correct", "✅ Good job!")
         else:
-            messagebox.showinfo("Incorrect", f"❌ Correct Answer: {self.questions[self.q_index]['answer']}")
+            messagebox.showinfo("Incorrect", f"❌ Correct Answer: {q['answer']}")
 
-        self.q_index += 1
         self.next_question()
 
     def show_summary(self):
+        threading.Thread(target=self.seen.save, daemon=True).start()
+        threading.Thread(target=self.stats.save, daemon=True).start()
         self.save_to_leaderboard()
         for widget in self.root.winfo_children():
             widget.destroy()
 
+        quiz = self.quiz
         tk.Label(self.root, text="🎉 Quiz Completed!", font=("Arial", 18)).pack(pady=20)
-        tk.Label(self.root, text=f"{self.player_name}, your score: {self.score}").pack()
-        tk.Label(self.root, text=f"Correct: {self.correct} / {len(self.questions)}").pack()
-        tk.Label(self.root, text=f"Accuracy: {(self.correct / len(self.questions)) * 100:.2f}%").pack(pady=10)
+        tk.Label(self.root, text=f"{quiz.player_name}, your score: {quiz.score}").pack()
+        tk.Label(self.root, text=f"Correct: {quiz.correct} / {quiz.total}").pack()
+        tk.Label(self.root, text=f"Accuracy: {quiz.accuracy * 100:.2f}%").pack(pady=10)
+        self.display_placement()
 
         tk.Button(self.root, text="Play Again", command=self.setup_start_screen).pack(pady=5)
-        tk.Button(self.root, text="Exit", command=self.root.quit).pack(pady=5)
+        tk.Button(self.root, text="Exit", command=self.quit).pack(pady=5)
 
         self.display_leaderboard()
 
+    def quit(self):
+        if self.quiz is not None and self.quiz.state != FINISHED:
+            # Abandoned: no result will be saved under the name
+            self.leaderboard.release_name(self.quiz.player_name)
+        self.leaderboard.close()
+        self.stats.save()
+        if self.seen is not None:
+            # Waits for a background save still writing
+            self.seen.save()
+        self.root.quit()
+
     def save_to_leaderboard(self):
         try:
-            with open(LEADERBOARD_FILE, "a") as file:
-                file.write(f"{self.player_name},{self.score},{self.difficulty}\n")
+            self.leaderboard.add(self.quiz.player_name, self.quiz.score, self.quiz.difficulty)
         except Exception as e:
             print(f"Error saving leaderboard: {e}")
 
+    def display_placement(self):
+        try:
+            place, total, percent = self.leaderboard.placement(self.quiz.score, self.quiz.difficulty)
+        except Exception as e:
+            print(f"Error reading leaderboard: {e}")
+            return
+        top = f"{percent:.0f}" if percent >= 1 else f"{percent:.2g}"
+        tk.Label(self.root, text=f"You placed #{place:,} of {total:,} on {self.quiz.difficulty} (top {top}%)").pack()
+
     def display_leaderboard(self):
         try:
-            with open(LEADERBOARD_FILE, "r") as file:
-                entries = [line.strip().split(",") for line in file.readlines()]
-                entries.sort(key=lambda x: int(x[1]), reverse=True)
-                top = entries[:5]
+            top = self.leaderboard.top(5)
 
             tk.Label(self.root, text="\n🏆 Leaderboard:", font=("Arial", 14, "bold")).pack()
             for i, entry in enumerate(top, 1):
@@ -214,3 +488,4 @@ if __name__ == "__main__":
     root = tk.Tk()
     app = QuizApp(root)
     root.mainloop()
+    app.leaderboard.close()
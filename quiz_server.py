@@ -0,0 +1,414 @@
+# Multiplayer quiz server for live events, on asyncio. Players connect over
+# TCP and speak newline-delimited JSON:
+#
+#   client -> server  {"type": "join", "name": "alice", "difficulty": "easy"}
+#                     {"type": "answer", "answer": "Paris"}
+#                     {"type": "stats"}
+#   server -> client  joined, question, answer (own result), reveal
+#                     (correct answer and lobby top 5), finished, stats, error
+#
+# Players are grouped into lobbies per difficulty. A lobby starts when it is
+# full or lobby_wait seconds after its first player joined. Everyone in a
+# lobby gets the same questions at the same moment with the same deadline.
+# Each player's round is a QuizSession, so the rules and scoring are the
+# ones the desktop game uses.
+#
+# All deadlines (lobby starts, question deadlines, pauses between questions)
+# live in one hashed timer wheel driven by a single task, so there is one
+# timer per lobby rather than one per player. Broadcasts are encoded once
+# and the same bytes are written to every player; a player whose socket
+# stops draining is dropped instead of buffering without bound.
+#
+# Usage: python quiz_server.py --port 9000 [--bank questions.jsonl] [--lobby-size 100]
+#                              [--lobby-wait 10] [--time-limit 15] [--questions 5]
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+from collections import deque
+
+from answer_grader import difficulty_points
+from leaderboard import LEADERBOARD_FILE
+from leaderboard_store import LEADERBOARD_DB, open_leaderboard
+from live_bank import open_questions
+from question_api import create_session, fetch_questions
+from question_cache import QuestionCache
+from quiz_session import ASKING, FINISHED, QUESTIONS_PER_ROUND, TIME_LIMIT, QuizSession
+
+TICK_SECONDS = 0.05
+WHEEL_SLOTS = 1024
+LAG_SAMPLES = 2000
+LOBBY_SIZE = 100
+LOBBY_WAIT = 10.0
+REVEAL_PAUSE = 3.0
+MAX_BUFFERED_BYTES = 64 * 1024
+MAX_NAME_LENGTH = 40
+LISTEN_BACKLOG = 4096
+PUBLIC_FIELDS = ("type", "question", "options")
+STANDINGS_SIZE = 5
+
+
+def encode(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+
+# Hashed timing wheel: entries due in the same tick share a slot, and a
+# slot holds entries for later laps of the wheel too, which wait for their
+# due tick. Scheduling and cancelling are O(1); each tick only looks at
+# one slot. The lag between when a tick was due and when it ran is kept
+# as the server's health measure.
+class TimerWheel:
+    def __init__(self, tick=TICK_SECONDS, slots=WHEEL_SLOTS):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.current = 0
+        self.lags = deque(maxlen=LAG_SAMPLES)
+        self.busy = deque(maxlen=LAG_SAMPLES)
+
+    def schedule(self, delay, callback, *args):
+        due = self.current + max(1, math.ceil(delay / self.tick))
+        entry = [due, callback, args]
+        self.slots[due % len(self.slots)].append(entry)
+        return entry
+
+    @staticmethod
+    def cancel(entry):
+        if entry is not None:
+            entry[1] = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        while True:
+            self.current += 1
+            due_at = start + self.current * self.tick
+            await asyncio.sleep(max(0.0, due_at - loop.time()))
+            woke = loop.time()
+            self.lags.append(woke - due_at)
+            index = self.current % len(self.slots)
+            slot = self.slots[index]
+            self.slots[index] = [entry for entry in slot if entry[0] > self.current]
+            for due, callback, args in slot:
+                if due <= self.current and callback is not None:
+                    try:
+                        callback(*args)
+                    except Exception as e:
+                        print(f"Error in timer callback: {e}")
+            self.busy.append(loop.time() - woke)
+
+    def stats(self):
+        lags = sorted(self.lags) or [0.0]
+        return {
+            "tick_ms": self.tick * 1000,
+            "lag_p50_ms": round(lags[len(lags) // 2] * 1000, 2),
+            "lag_p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 2),
+            "lag_max_ms": round(lags[-1] * 1000, 2),
+            "busy_max_ms": round(max(self.busy, default=0.0) * 1000, 2),
+            "busy_mean_ms": round(statistics.fmean(self.busy) * 1000, 3) if self.busy else 0.0,
+        }
+
+
+class Player:
+    __slots__ = ("name", "writer", "lobby", "quiz")
+
+    def __init__(self, name, writer):
+        self.name = name
+        self.writer = writer
+        self.lobby = None
+        self.quiz = None
+
+
+class Lobby:
+    __slots__ = ("lobby_id", "difficulty", "players", "started", "questions", "q_index", "unanswered",
+                 "start_entry", "close_entry")
+
+    def __init__(self, lobby_id, difficulty):
+        self.lobby_id = lobby_id
+        self.difficulty = difficulty
+        self.players = []
+        self.started = False
+        self.questions = []
+        self.q_index = 0
+        self.unanswered = 0
+        self.start_entry = None
+        self.close_entry = None
+
+
+class QuizServer:
+    def __init__(self, question_source, lobby_size=LOBBY_SIZE, lobby_wait=LOBBY_WAIT, time_limit=TIME_LIMIT,
+                 questions_per_round=QUESTIONS_PER_ROUND, reveal_pause=REVEAL_PAUSE, leaderboard=None):
+        self.question_source = question_source
+        self.lobby_size = lobby_size
+        self.lobby_wait = lobby_wait
+        self.time_limit = time_limit
+        self.questions_per_round = questions_per_round
+        self.reveal_pause = reveal_pause
+        self.leaderboard = leaderboard or open_leaderboard()
+        self.wheel = TimerWheel()
+        self.open_lobbies = {}
+        self.lobby_count = 0
+        self.names = set()
+        self.players = 0
+        self.finished_players = 0
+        self.tasks = set()
+
+    async def serve(self, host, port):
+        self.spawn(self.wheel.run())
+        server = await asyncio.start_server(self.handle, host, port, backlog=LISTEN_BACKLOG)
+        return server
+
+    def spawn(self, coroutine):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def handle(self, reader, writer):
+        player = None
+        self.players += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    kind = message["type"]
+                except (ValueError, KeyError, TypeError):
+                    self.send(writer, {"type": "error", "message": "expected one JSON object per line"})
+                    continue
+                if kind == "join" and player is None:
+                    player = await self.join(writer, message)
+                elif kind == "answer" and player is not None:
+                    self.answer(player, message.get("answer"))
+                elif kind == "stats":
+                    self.send(writer, dict(self.wheel.stats(), type="stats", players=self.players,
+                                           finished=self.finished_players, lobbies=self.lobby_count))
+                else:
+                    self.send(writer, {"type": "error", "message": f"unexpected {kind!r}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.players -= 1
+            if player is not None:
+                self.leave(player)
+            writer.close()
+
+    def send(self, writer, message):
+        self.write(writer, encode(message))
+
+    def write(self, writer, data):
+        if writer.is_closing():
+            return
+        # A player who stops reading is dropped rather than buffered forever
+        if writer.transport.get_write_buffer_size() > MAX_BUFFERED_BYTES:
+            writer.close()
+            return
+        writer.write(data)
+
+    def broadcast(self, lobby, message):
+        data = encode(message)
+        for player in lobby.players:
+            self.write(player.writer, data)
+
+    async def join(self, writer, message):
+        name = str(message.get("name", "")).strip()
+        difficulty = message.get("difficulty", "easy")
+        if not name or len(name) > MAX_NAME_LENGTH or any(ch in name for ch in ",\r\n"):
+            self.send(writer, {"type": "error", "message": "names must be 1-40 characters without commas"})
+            return None
+        # Checked before anything is created for the player; a list here is not even hashable
+        if type(difficulty) is not str or difficulty not in difficulty_points:
+            self.send(writer, {"type": "error", "message": f"difficulty must be one of {', '.join(difficulty_points)}"})
+            return None
+        if name.casefold() in self.names:
+            self.send(writer, {"type": "error", "message": f"the name {name!r} is taken"})
+            return None
+
+        # Held while the leaderboard is asked, so a second join with the name
+        # is refused here; the claim keeps it once the player has left with a
+        # result, and is released if they leave before the round ends
+        self.names.add(name.casefold())
+        try:
+            claimed = await asyncio.to_thread(self.leaderboard.claim_name, name)
+        except Exception as e:
+            print(f"Error claiming name: {e}")
+            claimed = None
+        if not claimed:
+            self.names.discard(name.casefold())
+            reason = f"the name {name!r} is taken" if claimed is False else "could not check the name, try again"
+            self.send(writer, {"type": "error", "message": reason})
+            return None
+
+        player = Player(name, writer)
+        lobby = self.open_lobbies.get(difficulty)
+        if lobby is None:
+            self.lobby_count += 1
+            lobby = self.open_lobbies[difficulty] = Lobby(self.lobby_count, difficulty)
+            lobby.start_entry = self.wheel.schedule(self.lobby_wait, self.start_lobby, lobby)
+        player.lobby = lobby
+        player.quiz = QuizSession(name, difficulty, self.questions_per_round, self.time_limit)
+        lobby.players.append(player)
+        self.send(writer, {"type": "joined", "lobby": lobby.lobby_id, "players": len(lobby.players)})
+        if len(lobby.players) >= self.lobby_size:
+            self.wheel.cancel(lobby.start_entry)
+            self.start_lobby(lobby)
+        return player
+
+    def leave(self, player):
+        self.names.discard(player.name.casefold())
+        if player.quiz.state != FINISHED:
+            self.spawn(self.release_name(player.name))
+        lobby = player.lobby
+        if player in lobby.players:
+            lobby.players.remove(player)
+        if player.quiz.state == ASKING:
+            lobby.unanswered -= 1
+            if lobby.unanswered == 0:
+                self.wheel.cancel(lobby.close_entry)
+                self.close_question(lobby)
+
+    def start_lobby(self, lobby):
+        if lobby.started:
+            return
+        lobby.started = True
+        if self.open_lobbies.get(lobby.difficulty) is lobby:
+            del self.open_lobbies[lobby.difficulty]
+        self.spawn(self.load_questions(lobby))
+
+    async def load_questions(self, lobby):
+        try:
+            questions = await asyncio.to_thread(self.question_source, lobby.difficulty, self.questions_per_round)
+        except Exception as e:
+            print(f"Error loading questions: {e}")
+            questions = []
+        if not questions:
+            self.broadcast(lobby, {"type": "error", "message": "no questions available, try again later"})
+            for player in list(lobby.players):
+                player.writer.close()
+            return
+        lobby.questions = questions
+        for player in lobby.players:
+            player.quiz.start(questions)
+        self.ask_next(lobby)
+
+    def ask_next(self, lobby):
+        if not lobby.players:
+            return
+        now = asyncio.get_running_loop().time()
+        for player in lobby.players:
+            player.quiz.ask(now)
+        lobby.unanswered = len(lobby.players)
+        question = lobby.questions[lobby.q_index]
+        public = {key: question[key] for key in PUBLIC_FIELDS if key in question}
+        self.broadcast(lobby, {"type": "question", "index": lobby.q_index + 1, "of": len(lobby.questions),
+                               "time_limit": self.time_limit, "question": public})
+        lobby.close_entry = self.wheel.schedule(self.time_limit, self.close_question, lobby)
+
+    def answer(self, player, response):
+        quiz = player.quiz
+        if quiz.state != ASKING or not isinstance(response, str):
+            return
+        correct = quiz.answer(response, asyncio.get_running_loop().time())
+        self.send(player.writer, {"type": "answer", "correct": correct, "score": quiz.score})
+        lobby = player.lobby
+        lobby.unanswered -= 1
+        if lobby.unanswered == 0:
+            # Everyone has answered: no need to wait for the deadline
+            self.wheel.cancel(lobby.close_entry)
+            self.close_question(lobby)
+
+    def close_question(self, lobby):
+        lobby.close_entry = None
+        for player in lobby.players:
+            if player.quiz.state == ASKING:
+                player.quiz.timeout()
+        lobby.unanswered = 0
+        question = lobby.questions[lobby.q_index]
+        self.broadcast(lobby, {"type": "reveal", "index": lobby.q_index + 1, "answer": question["answer"],
+                               "standings": self.standings(lobby)})
+        lobby.q_index += 1
+        if lobby.q_index < len(lobby.questions):
+            self.wheel.schedule(self.reveal_pause, self.ask_next, lobby)
+        else:
+            self.finish_lobby(lobby)
+
+    def standings(self, lobby, size=STANDINGS_SIZE):
+        ranked = sorted(lobby.players, key=lambda player: player.quiz.score, reverse=True)[:size]
+        return [[player.name, player.quiz.score] for player in ranked]
+
+    def finish_lobby(self, lobby):
+        ranked = sorted(lobby.players, key=lambda player: player.quiz.score, reverse=True)
+        for place, player in enumerate(ranked, 1):
+            quiz = player.quiz
+            quiz.finish()
+            self.send(player.writer, {"type": "finished", "score": quiz.score, "correct": quiz.correct,
+                                      "total": quiz.total, "place": place, "players": len(ranked)})
+        self.finished_players += len(ranked)
+        rows = [(player.name, player.quiz.score, lobby.difficulty) for player in ranked]
+        self.spawn(self.save_results(rows))
+
+    async def release_name(self, name):
+        try:
+            await asyncio.to_thread(self.leaderboard.release_name, name)
+        except Exception as e:
+            print(f"Error releasing name: {e}")
+
+    async def save_results(self, rows):
+        try:
+            await asyncio.to_thread(self.leaderboard.add_many, rows)
+        except Exception as e:
+            print(f"Error saving leaderboard: {e}")
+
+
+# Without a bank, rounds come from the API and fall back to the cache
+def question_source_for(bank_paths):
+    if bank_paths:
+        bank = open_questions(bank_paths)
+        return lambda difficulty, num: list(fetch_questions(difficulty, num, bank=bank))
+
+    session = create_session()
+    cache = QuestionCache()
+    return lambda difficulty, num: list(fetch_questions(difficulty, num, session, cache))
+
+
+async def run_server(args):
+    server = QuizServer(
+        question_source_for(args.bank),
+        lobby_size=args.lobby_size,
+        lobby_wait=args.lobby_wait,
+        time_limit=args.time_limit,
+        questions_per_round=args.questions,
+        reveal_pause=args.reveal_pause,
+        leaderboard=open_leaderboard(args.leaderboard, args.leaderboard_db),
+    )
+    listener = await server.serve(args.host, args.port)
+    host, port = listener.sockets[0].getsockname()[:2]
+    print(f"Quiz server listening on {host}:{port} (pid {os.getpid()})", flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the multiplayer quiz server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--bank", nargs="+", help="a .qbank file or JSON/CSV question files (default: the API)")
+    parser.add_argument("--lobby-size", type=int, default=LOBBY_SIZE)
+    parser.add_argument("--lobby-wait", type=float, default=LOBBY_WAIT)
+    parser.add_argument("--time-limit", type=float, default=TIME_LIMIT)
+    parser.add_argument("--questions", type=int, default=QUESTIONS_PER_ROUND)
+    parser.add_argument("--reveal-pause", type=float, default=REVEAL_PAUSE)
+    parser.add_argument("--leaderboard", default=LEADERBOARD_FILE)
+    parser.add_argument("--leaderboard-db", default=LEADERBOARD_DB, help="used instead of --leaderboard once it exists")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_server(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# The rules of one quiz round, independent of any UI: which question is
+# current, its deadline, scoring and when the round is over. A view (the Tk
+# app, a network server) feeds it events and reads its state back:
+#
+#   start        the round begins, with whatever questions are already there
+#   add_questions / done_loading
+#                more questions arrived / none will follow
+#   ask          the current question is shown and its deadline starts
+#   answer       the player answered the current question
+#   timeout      the deadline passed without an answer
+#   finish       the round ends early
+#
+# States: NEW -> (WAITING <-> READY -> ASKING)* -> FINISHED. WAITING means
+# the player is ahead of the questions that have arrived.
+#
+# Sessions use __slots__ and share one grader, so a server can hold many
+# thousands of them.
+import time
+
+from answer_grader import AnswerGrader, difficulty_points
+
+TIME_LIMIT = 15
+QUESTIONS_PER_ROUND = 5
+
+NEW = "new"
+WAITING = "waiting"
+READY = "ready"
+ASKING = "asking"
+FINISHED = "finished"
+
+shared_grader = AnswerGrader()
+
+
+class QuizSession:
+    __slots__ = ("player_name", "difficulty", "round_size", "time_limit", "grader", "questions", "loading",
+                 "q_index", "score", "correct", "state", "deadline")
+
+    def __init__(self, player_name, difficulty, round_size=QUESTIONS_PER_ROUND, time_limit=TIME_LIMIT, grader=None):
+        self.player_name = player_name
+        self.difficulty = difficulty
+        self.round_size = round_size
+        self.time_limit = time_limit
+        self.grader = grader or shared_grader
+        self.questions = []
+        self.loading = False
+        self.q_index = 0
+        self.score = 0
+        self.correct = 0
+        self.state = NEW
+        self.deadline = None
+
+    @property
+    def current_question(self):
+        if self.state in (READY, ASKING):
+            return self.questions[self.q_index]
+        return None
+
+    @property
+    def total(self):
+        return len(self.questions)
+
+    @property
+    def accuracy(self):
+        return self.correct / len(self.questions) if self.questions else 0.0
+
+    def remaining(self, now=None):
+        if self.deadline is None:
+            return self.time_limit
+        return max(0.0, self.deadline - (time.monotonic() if now is None else now))
+
+    def start(self, questions=(), loading=False):
+        if self.state != NEW:
+            raise ValueError(f"cannot start a session that is {self.state}")
+        self.loading = loading
+        self.add_questions(questions)
+        self._advance()
+
+    def add_questions(self, questions):
+        space = self.round_size - len(self.questions)
+        self.questions.extend(list(questions)[:max(0, space)])
+        if self.state == WAITING:
+            self._advance()
+
+    def done_loading(self):
+        self.loading = False
+        if self.state == WAITING:
+            self._advance()
+
+    def ask(self, now=None):
+        if self.state != READY:
+            raise ValueError(f"no question to ask while {self.state}")
+        self.state = ASKING
+        self.deadline = (time.monotonic() if now is None else now) + self.time_limit
+        return self.questions[self.q_index]
+
+    # Returns whether the answer was correct; an answer that arrives after
+    # the deadline counts as a timeout
+    def answer(self, response, now=None):
+        if self.state != ASKING:
+            raise ValueError(f"cannot answer while {self.state}")
+        if (time.monotonic() if now is None else now) > self.deadline:
+            self.timeout()
+            return False
+        correct = self.grader.grade(self.questions[self.q_index], response)
+        if correct:
+            self.correct += 1
+            self.score += difficulty_points.get(self.difficulty, 0)
+        self.q_index += 1
+        self._advance()
+        return correct
+
+    def timeout(self):
+        if self.state != ASKING:
+            raise ValueError(f"cannot time out while {self.state}")
+        self.q_index += 1
+        self._advance()
+
+    def finish(self):
+        self.state = FINISHED
+        self.deadline = None
+
+    def _advance(self):
+        self.deadline = None
+        if self.q_index < len(self.questions):
+            self.state = READY
+        elif self.loading and self.q_index < self.round_size:
+            self.state = WAITING
+        else:
+            self.state = FINISHED
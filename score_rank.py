@@ -0,0 +1,89 @@
+# Where a score places among everyone else's, per difficulty, without
+# sorting the leaderboard. Scores come from a small bounded range (at most
+# points per question x questions per round), so each difficulty keeps a
+# Fenwick tree of how many results have each score: counting the results
+# above a score, and adding one, are O(log range) however many results
+# there are.
+from array import array
+from collections import Counter
+
+from answer_grader import difficulty_points
+from quiz_session import QUESTIONS_PER_ROUND
+
+DEFAULT_MAX_SCORE = max(difficulty_points.values()) * QUESTIONS_PER_ROUND
+
+
+# (place, out of, top percent) given how many results are above a score;
+# equal scores share a place
+def placement_from(above, total):
+    place = above + 1
+    total = max(total, place)
+    return place, total, 100.0 * place / total
+
+
+# Counts per score 0..size-1; prefix(i) is the number of scores <= i
+class FenwickTree:
+    def __init__(self, size):
+        self.size = size
+        self.tree = array("Q", bytes(8 * (size + 1)))
+
+    def add(self, i, delta=1):
+        i += 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        i = min(i, self.size - 1) + 1
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def counts(self):
+        sums = [self.prefix(i) for i in range(self.size)]
+        return [high - low for low, high in zip([0] + sums, sums)]
+
+
+class ScoreRanks:
+    def __init__(self):
+        self.trees = {}
+        self.totals = Counter()
+
+    def _tree(self, difficulty, score):
+        tree = self.trees.get(difficulty)
+        if tree is None or score >= tree.size:
+            # A score above the usual range (e.g. a longer server round): grow,
+            # re-adding the old counts
+            size = max(score + 1, 2 * tree.size if tree else 0, DEFAULT_MAX_SCORE + 1)
+            grown = FenwickTree(size)
+            for value, number in enumerate(tree.counts() if tree else []):
+                if number:
+                    grown.add(value, number)
+            tree = self.trees[difficulty] = grown
+        return tree
+
+    def add_many(self, difficulty, scores):
+        for score, number in Counter(max(0, score) for score in scores).items():
+            self._tree(difficulty, score).add(score, number)
+            self.totals[difficulty] += number
+
+    def add(self, difficulty, score):
+        self.add_many(difficulty, [score])
+
+    def total(self, difficulty):
+        return self.totals[difficulty]
+
+    # The number of results strictly above score
+    def above(self, difficulty, score):
+        tree = self.trees.get(difficulty)
+        if tree is None:
+            return 0
+        return self.totals[difficulty] - tree.prefix(max(0, score))
+
+    def rank(self, difficulty, score):
+        return self.above(difficulty, score) + 1
+
+    def placement(self, difficulty, score):
+        return placement_from(self.above(difficulty, score), self.totals[difficulty])
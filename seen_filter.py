@@ -0,0 +1,87 @@
+import hashlib
+import os
+import re
+import struct
+import threading
+
+SEEN_DIR = "seen_questions"
+BLOOM_BITS = 1 << 20  # 128 KiB per player, ~1% false positives at 100k questions
+BLOOM_HASHES = 7
+BLOOM_MAGIC = b"QBF1"
+
+
+def normalize_text(text):
+    return " ".join(re.sub(r"[^\w\s]", "", text.casefold()).split())
+
+
+# Fixed-size Bloom filter: memory and file size stay the same no matter how
+# many questions have been added. May report an unseen question as seen,
+# never the other way round.
+class BloomFilter:
+    def __init__(self, num_bits=BLOOM_BITS, num_hashes=BLOOM_HASHES, bits=None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray(num_bits // 8)
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for pos in self.positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(key))
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(BLOOM_MAGIC + struct.pack("<QI", self.num_bits, self.num_hashes))
+            file.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            header = file.read(len(BLOOM_MAGIC) + 12)
+            if header[:len(BLOOM_MAGIC)] != BLOOM_MAGIC:
+                raise ValueError(f"{path} is not a seen-questions filter.")
+            num_bits, num_hashes = struct.unpack("<QI", header[len(BLOOM_MAGIC):])
+            bits = bytearray(file.read())
+        if len(bits) != num_bits // 8:
+            raise ValueError(f"{path} is truncated.")
+        return cls(num_bits, num_hashes, bits)
+
+
+# Questions a player has already been shown, kept across sessions in one
+# Bloom filter file per player.
+class SeenQuestions:
+    def __init__(self, player_name, directory=SEEN_DIR):
+        name_hash = hashlib.sha1(player_name.casefold().encode()).hexdigest()
+        self.path = os.path.join(directory, f"{name_hash}.bloom")
+        self.directory = directory
+        # Saves run in the background; one at a time, as they share a temp file
+        self.save_lock = threading.Lock()
+        try:
+            self.filter = BloomFilter.load(self.path)
+        except FileNotFoundError:
+            self.filter = BloomFilter()
+        except Exception as e:
+            print(f"Error reading seen questions: {e}")
+            self.filter = BloomFilter()
+
+    def add(self, question):
+        self.filter.add(normalize_text(question["question"]))
+
+    def __contains__(self, question):
+        return normalize_text(question["question"]) in self.filter
+
+    def save(self):
+        with self.save_lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                self.filter.save(self.path)
+            except Exception as e:
+                print(f"Error saving seen questions: {e}")